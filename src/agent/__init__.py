@@ -3,7 +3,8 @@ from .action_engine import ActionEngine
 from .code_modifier import CodeModifier
 from .error_handler import ErrorHandler
 from .thought_logger import ThoughtLogger
-from .chat_with_ollama import ChatGPT
+from .chat_with_ollama import ChatGPT, get_llm_client
+from .dispatcher import AgentDispatcher
 
 __all__ = [
     "NLPProcessor",
@@ -12,4 +13,6 @@ __all__ = [
     "ErrorHandler",
     "ThoughtLogger",
     "ChatGPT",
+    "get_llm_client",
+    "AgentDispatcher",
 ]
\ No newline at end of file
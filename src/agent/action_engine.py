@@ -1,14 +1,16 @@
 from typing import Dict
 from src.agent.code_modifier import CodeModifier
 from src.agent.error_handler import ErrorHandler
-from src.agent.chat_with_ollama import ChatGPT
+from src.agent.chat_with_ollama import get_llm_client
+from src.agent.context_builder import ContextBuilder
 from src.agent.thought_logger import ThoughtLogger  # Import ThoughtLogger
 
 class ActionEngine:
     def __init__(self):
         self.code_modifier = CodeModifier()
         self.error_handler = ErrorHandler()
-        self.llm_client = ChatGPT()
+        self.llm_client = get_llm_client()
+        self.context_builder = ContextBuilder()
         self.thought_logger = ThoughtLogger()  # Initialize ThoughtLogger
 
     async def decide_action(self, parsed_input: Dict) -> str:
@@ -27,19 +29,38 @@ class ActionEngine:
         self.thought_logger.log_thought(f"Extracted parameters: {parameters}")  # Log parameters
         return parameters
 
-    async def execute_action(self, action: str, parameters: Dict) -> Dict:
+    async def build_context(self, target: str) -> str:
         """
-        Executes the determined action with the given parameters.
+        Collects related code from the graph for the prompt; generation goes ahead without it on failure.
+        """
+        try:
+            return await self.context_builder.build(target)
+        except Exception as e:
+            self.thought_logger.log_thought(f"Skipped graph context for {target}: {e}")
+            return ""
+
+    async def execute_action(self, action: str, parameters: Dict, on_token=None) -> Dict:
+        """
+        Executes the determined action with the given parameters. When on_token is given,
+        generated text is passed to it piece by piece as the model produces it.
         """
         try:
             if action == "generate_code":
                 module = parameters.get("module", "default")
                 # Utilize LLM for generating code based on module
                 prompt = f"Generate a Python module named '{module}' with basic structure."
-                code = await self.llm_client.generate(prompt)
-                updated_node = self.code_modifier.modify_code(node_id=f"{module}_module", new_content=code)
+                context = await self.build_context(module)
+                if context:
+                    prompt = f"Relevant code from the existing codebase:\n\n{context}\n\n{prompt}"
+                code = await self.llm_client.generate(
+                    prompt, cache_params={"action": action, "module": module}, on_token=on_token
+                )
+                stored = await self.code_modifier.modify_code(node_id=f"{module}_module", new_content=code)
+                if isinstance(stored, dict) and "error" in stored:
+                    self.thought_logger.log_thought(f"Failed to store code for module {module}: {stored['error']}")
+                    return {"action": "error", "details": stored["error"]}
                 self.thought_logger.log_thought(f"Generated code for module: {module}")  # Log code generation
-                return {"action": action, "code": updated_node["content"]}
+                return {"action": action, "code": code}
             elif action == "refactor_code":
                 # Placeholder for refactoring logic
                 refactored_code = "# Refactored code"
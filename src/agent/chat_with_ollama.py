@@ -1,71 +1,129 @@
 import aiohttp
 import json
 import re
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator
 import asyncio
 from tenacity import retry, stop_after_attempt, wait_exponential
 import jsonschema
 from jsonschema import validate
-import requests
-import time
+import os
+import threading
 from src.logger import logger
+from src.agent.summarizer import Summarizer
+from src.agent.response_cache import ResponseCache
+from src.agent.concurrency import ModelLimiter, SingleFlight
 import logging
 
 class ChatGPT:
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        self.base_url = base_url
+    """
+    Async Ollama client. One aiohttp session per event loop is kept open and reused, so
+    calls share keep-alive connections from a pool bounded by max_connections.
+    Use get_llm_client() for the process-wide instance and close() it on shutdown.
+    """
+
+    def __init__(self, base_url: str = None, max_connections: int = None, connect_timeout: float = None,
+                 read_timeout: float = None):
+        self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        self.max_connections = max_connections or int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+        # Generations can run for minutes, so there is no total limit; a stalled read fails instead.
+        self.timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=connect_timeout or float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "10")),
+            sock_read=read_timeout or float(os.getenv("OLLAMA_READ_TIMEOUT", "300")),
+        )
+        self._sessions = {}
+        # Summaries go straight to the retried request, so chunks are never re-summarised.
+        self.summarizer = Summarizer(self._chat_request)
+        self.embedding_model = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+        # Near-duplicate matching costs an embedding call per miss, so it is opt-in.
+        semantic = os.getenv("LLM_CACHE_SEMANTIC", "").lower() in ("1", "true", "yes")
+        self.response_cache = ResponseCache(embed=self.embed if semantic else None)
+        self.limiter = ModelLimiter()
+        self._single_flight = SingleFlight()
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.INFO)
 
-    @retry(
-        stop=stop_after_attempt(6), wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
+    def _session(self) -> aiohttp.ClientSession:
+        # aiohttp sessions are bound to the loop that created them.
+        loop = asyncio.get_running_loop()
+        self._prune_sessions()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._sessions[loop] = session
+        return session
+
+    def _prune_sessions(self) -> None:
+        """Drops the sessions of loops that have been closed, e.g. by asyncio.run() in a worker thread."""
+        for loop in [loop for loop in list(self._sessions) if loop.is_closed()]:
+            session = self._sessions.pop(loop, None)
+            if session is None:
+                continue
+            if not session.closed and session.connector is not None:
+                # session.close() needs its own loop; the pooled sockets are closed directly instead.
+                session.connector._close()
+            session.detach()
+
+    async def close(self) -> None:
+        """Closes the session owned by the running loop."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
     async def chat_with_ollama(self, system_prompt: str, user_prompt: str) -> str:
         max_tokens = 20000  # Adjust based on your model's actual limit
+        # Summarised once up front; only the request itself is retried.
         chunked_user_prompt = await self.chunk_and_summarize(user_prompt, max_tokens)
+        return await self._chat_request(system_prompt, chunked_user_prompt)
+
+    @retry(
+        stop=stop_after_attempt(6), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    async def _chat_request(self, system_prompt: str, chunked_user_prompt: str) -> str:
         logger.info(
-            f"Sending request to Ollama with system prompt: {system_prompt} and user_prompt: {user_prompt}",
+            f"Sending request to Ollama with system prompt: {system_prompt} and user_prompt: {chunked_user_prompt}",
             {"component": "ChatGPT", "method": "chat_with_ollama"},
         )
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": "hermes3",
-                        "prompt": f"{system_prompt}\n\nUser: {chunked_user_prompt}\nAssistant:",
-                        "stream": False,
-                    },
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if "response" in data:
-                            logger.debug(
-                                f"Received response from Ollama: {data['response']}",
-                                {"component": "ChatGPT", "method": "chat_with_ollama"},
-                            )
-                            return data["response"]
-                        else:
-                            logger.error(
-                                f"Unexpected response structure: {data}",
-                                {"component": "ChatGPT", "method": "chat_with_ollama"},
-                            )
-                            raise ValueError(
-                                "Unexpected response structure from Ollama API"
-                            )
+        session = self._session()
+        try:
+            async with self.limiter.slot("hermes3"), session.post(
+                f"{self.base_url}/api/generate",
+                json={
+                    "model": "hermes3",
+                    "prompt": f"{system_prompt}\n\nUser: {chunked_user_prompt}\nAssistant:",
+                    "stream": False,
+                },
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if "response" in data:
+                        logger.debug(
+                            f"Received response from Ollama: {data['response']}",
+                            {"component": "ChatGPT", "method": "chat_with_ollama"},
+                        )
+                        return data["response"]
                     else:
-                        error_msg = f"Error from Ollama API: {response.status} - {await response.text()}"
                         logger.error(
-                            error_msg,
+                            f"Unexpected response structure: {data}",
                             {"component": "ChatGPT", "method": "chat_with_ollama"},
                         )
-                        raise Exception(error_msg)
-            except aiohttp.ClientError as e:
-                logger.error(
-                    f"Network error in Ollama API call: {str(e)}",
-                    {"component": "ChatGPT", "method": "chat_with_ollama"},
-                )
-                raise
+                        raise ValueError(
+                            "Unexpected response structure from Ollama API"
+                        )
+                else:
+                    error_msg = f"Error from Ollama API: {response.status} - {await response.text()}"
+                    logger.error(
+                        error_msg,
+                        {"component": "ChatGPT", "method": "chat_with_ollama"},
+                    )
+                    raise Exception(error_msg)
+        except aiohttp.ClientError as e:
+            logger.error(
+                f"Network error in Ollama API call: {str(e)}",
+                {"component": "ChatGPT", "method": "chat_with_ollama"},
+            )
+            raise
 
     async def chunk_and_summarize(
         self, text: str, max_tokens: int = 10000, overlap_ratio: float = 0.3
@@ -81,63 +139,133 @@ class ChatGPT:
         Returns:
             str: The summarized text.
         """
-        # Estimate token count (rough estimation, adjust as needed)
-        estimated_tokens = len(text.split())
+        return await self.summarizer.summarize(text, max_tokens, overlap_ratio)
 
-        if estimated_tokens <= max_tokens:
-            return text
+    async def embed(self, text: str) -> list:
+        async with self.limiter.slot(self.embedding_model), self._session().post(
+            f"{self.base_url}/api/embeddings",
+            json={"model": self.embedding_model, "prompt": text},
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data["embedding"]
 
-        chunk_size = max_tokens
-        overlap_size = int(chunk_size * overlap_ratio)
-        chunks = []
+    async def generate(self, prompt: str, use_cache: bool = True, cache_params: Dict[str, Any] = None,
+                       semantic_cache: bool = True, on_token=None) -> str:
+        """
+        Sends a prompt to the Ollama API and retrieves the generated response.
+        Responses are served from and stored in the response cache unless use_cache is False.
+        Prompts built from a template should pass the values filled into it as cache_params,
+        so the cache never answers with a response generated for different values.
+        semantic_cache=False limits the cache to exact prompt matches.
 
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start = end - overlap_size
+        When on_token is given, the response is streamed and each piece is awaited with
+        on_token as it arrives. Cached responses, and responses shared with an identical
+        call already in flight, are passed to it in one piece.
+        """
+        if use_cache:
+            cached = await self.response_cache.get("hermes3", prompt, params=cache_params, semantic=semantic_cache)
+            if cached is not None:
+                self.logger.debug("Serving prompt from the response cache")
+                if on_token is not None:
+                    await on_token(cached)
+                return cached
+        streamed = False
 
-        summarized_chunks = []
-        for chunk in chunks:
-            summary_prompt = (
-                f"Summarize the following text, preserving key information:\n\n{chunk}"
-            )
-            summary = await self.chat_with_ollama(
-                "You are a skilled text summarizer.", summary_prompt
-            )
-            summarized_chunks.append(summary)
+        def call():
+            nonlocal streamed
+            if on_token is None:
+                return self._generate(prompt)
+            streamed = True
+            return self._generate_streaming(prompt, on_token)
 
-        final_summary = "\n\n".join(summarized_chunks)
-        return final_summary
+        # Identical prompts already in flight share one model call.
+        generated_text = await self._single_flight.run(ResponseCache.key("hermes3", prompt, params=cache_params), call)
+        if on_token is not None and not streamed and generated_text:
+            await on_token(generated_text)
+        if use_cache and generated_text:
+            await self.response_cache.put("hermes3", prompt, generated_text, params=cache_params)
+        return generated_text
+
+    async def _generate_streaming(self, prompt: str, on_token) -> str:
+        pieces = []
+        async for token in self.generate_stream(prompt):
+            pieces.append(token)
+            if on_token is not None:
+                try:
+                    await on_token(token)
+                except Exception as e:
+                    # Callers coalesced onto this call still need the full response.
+                    self.logger.warning(f"Stopped forwarding streamed tokens: {e}")
+                    on_token = None
+        return "".join(pieces)
+
+    async def _generate(self, prompt: str) -> str:
+        self.logger.info(f"Sending prompt to Ollama: {prompt}")
+        session = self._session()
+        try:
+            async with self.limiter.slot("hermes3"), session.post(
+                f"{self.base_url}/api/generate",
+                json={
+                    "model": "hermes3",
+                    "prompt": prompt,
+                    "stream": False,
+                },
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    generated_text = data.get("response", "")
+                    self.logger.debug(f"Received response: {generated_text}")
+                    return generated_text
+                else:
+                    error_msg = f"Ollama API returned status {response.status}"
+                    self.logger.error(error_msg)
+                    raise Exception(error_msg)
+        except aiohttp.ClientError as e:
+            self.logger.error(f"Network error: {str(e)}")
+            raise
 
-    async def generate(self, prompt: str) -> str:
+    async def generate_stream(self, prompt: str, model: str = "hermes3") -> AsyncIterator[str]:
         """
-        Sends a prompt to the Ollama API and retrieves the generated response.
+        Streams the generated response from the Ollama API, yielding text as tokens arrive.
+        Ollama sends one JSON object per line until an object with "done" set.
         """
-        self.logger.info(f"Sending prompt to Ollama: {prompt}")
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": "hermes3",
-                        "prompt": prompt,
-                        "stream": False,
-                    },
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        generated_text = data.get("response", "")
-                        self.logger.debug(f"Received response: {generated_text}")
-                        return generated_text
-                    else:
-                        error_msg = f"Ollama API returned status {response.status}"
-                        self.logger.error(error_msg)
-                        raise Exception(error_msg)
-            except aiohttp.ClientError as e:
-                self.logger.error(f"Network error: {str(e)}")
-                raise
+        self.logger.info("Streaming prompt to Ollama")
+        session = self._session()
+        try:
+            async with self.limiter.slot(model), session.post(
+                f"{self.base_url}/api/generate",
+                json={
+                    "model": model,
+                    "prompt": prompt,
+                    "stream": True,
+                },
+            ) as response:
+                if response.status != 200:
+                    error_msg = f"Ollama API returned status {response.status}"
+                    self.logger.error(error_msg)
+                    raise Exception(error_msg)
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if "error" in data:
+                        raise Exception(f"Error from Ollama API: {data['error']}")
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        return
+        except aiohttp.ClientError as e:
+            self.logger.error(f"Network error: {str(e)}")
+            raise
+
+    async def chat_with_ollama_stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Streaming counterpart of chat_with_ollama. Nothing is retried once tokens have been yielded."""
+        chunked_user_prompt = await self.chunk_and_summarize(user_prompt, 20000)
+        async for token in self.generate_stream(
+            f"{system_prompt}\n\nUser: {chunked_user_prompt}\nAssistant:"
+        ):
+            yield token
 
     async def robust_chat_with_ollama(
         self, system_prompt: str, user_prompt: str
@@ -245,25 +373,25 @@ class ChatGPT:
             )
             return {"error": "Fallback response due to error"}
 
-    def chat_with_ollama_nojson(
+    async def chat_with_ollama_nojson(
         self, system_prompt: str, prompt: str, retries: int = 5, delay: int = 5
     ):
-        url = "http://localhost:11434/api/generate"
         payload = {
             "model": "llama3.1",
             "prompt": f"{system_prompt}\n{prompt}",
             "stream": False,
         }
-        headers = {"Content-Type": "application/json"}
         for i in range(retries):
             try:
-                response = requests.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                response = response.json()
-                return response["response"]
-            except requests.exceptions.RequestException as e:
+                async with self.limiter.slot("llama3.1"), self._session().post(
+                    f"{self.base_url}/api/generate", json=payload
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                    return data["response"]
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 if i < retries - 1:  # i is zero indexed
-                    time.sleep(delay)  # wait before trying again
+                    await asyncio.sleep(delay)  # wait before trying again without blocking the loop
                 else:
                     logger.error(
                         f"Failed after {retries} attempts: {str(e)}",
@@ -281,3 +409,15 @@ class ChatGPT:
         )
 
 
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_client() -> ChatGPT:
+    """Process-wide client, so every agent component shares one connection pool."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = ChatGPT()
+    return _shared_client
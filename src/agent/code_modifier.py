@@ -1,12 +1,12 @@
 from typing import Dict
 from src.database.node_manager import NodeManager
-from src.agent.chat_with_ollama import ChatGPT
+from src.agent.chat_with_ollama import get_llm_client
 from src.agent.error_handler import ErrorHandler
 
 class CodeModifier:
     def __init__(self):
         self.node_manager = NodeManager()
-        self.llm_client = ChatGPT()
+        self.llm_client = get_llm_client()
         self.error_handler = ErrorHandler()
 
     async def modify_code(self, node_id: str, new_content: str) -> Dict:
@@ -30,7 +30,7 @@ class CodeModifier:
             features = specification.get("features", [])
             feature_str = ", ".join(features)
             prompt = f"Generate a Python module named '{module}' with features: {feature_str}."
-            code = await self.llm_client.generate(prompt)
+            code = await self.llm_client.generate(prompt, cache_params={"module": module, "features": features})
             return code
         except Exception as e:
             error_details = self.error_handler.handle_error(e)
@@ -0,0 +1,99 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict
+
+
+class LoopLocal:
+    """
+    One value per running event loop. asyncio primitives are bound to the loop that
+    first uses them, and the shared LLM client serves several loops (one per thread
+    or asyncio.run call), so each loop gets its own. Values of closed loops are dropped
+    whenever a new loop is seen.
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        self.factory = factory
+        self._values = {}
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        value = self._values.get(loop)
+        if value is None:
+            for closed in [other for other in list(self._values) if other.is_closed()]:
+                self._values.pop(closed, None)
+            value = self._values[loop] = self.factory()
+        return value
+
+
+class ModelLimiter:
+    """
+    Caps the number of concurrent requests sent to each model.
+
+    Limits come from per_model, else LLM_MAX_CONCURRENCY. Requests beyond the limit
+    wait their turn in FIFO order instead of piling onto the model server. Limits apply
+    per event loop.
+    """
+
+    def __init__(self, default_limit: int = None, per_model: Dict[str, int] = None):
+        self.default_limit = default_limit or int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.per_model = per_model or {}
+        self._semaphores = LoopLocal(dict)
+        self.waiting = {}
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphores = self._semaphores.get()
+        semaphore = semaphores.get(model)
+        if semaphore is None:
+            semaphore = semaphores[model] = asyncio.Semaphore(self.per_model.get(model, self.default_limit))
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        semaphore = self._semaphore(model)
+        self.waiting[model] = self.waiting.get(model, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting[model] -= 1
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while a call for a key is running, later
+    callers with the same key await its result instead of starting their own. The
+    shared call is cancelled only once every caller waiting on it has been cancelled.
+    """
+
+    def __init__(self):
+        # Calls only coalesce within a loop; a task cannot be awaited from another one.
+        self._calls = LoopLocal(dict)
+        self.coalesced = 0
+
+    async def run(self, key: str, call: Callable[[], Awaitable]):
+        calls = self._calls.get()
+        entry = calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(call())
+            entry = calls[key] = [task, 0]
+
+            def forget(_):
+                if calls.get(key) is entry:
+                    del calls[key]
+
+            task.add_done_callback(forget)
+        else:
+            self.coalesced += 1
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if not entry[0].done() and entry[1] == 1:
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
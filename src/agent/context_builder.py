@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from src.parsing.graph_builder import render_entity
+from src.parsing.tokenizer import Tokenizer
+
+# How much a neighbour reached over each relationship type counts towards its score.
+# Base classes and interfaces constrain new code the most, then the functions it
+# calls or is called by, then what sits in the same container, then plain imports.
+EDGE_WEIGHTS = {
+    "INHERITS": 1.0,
+    "IMPLEMENTS": 1.0,
+    "CALLS": 0.8,
+    "CONTAINS": 0.7,
+    "IMPORTS": 0.5,
+}
+HOP_DECAY = 0.5
+DOCSTRING_BONUS = 0.25
+
+
+class ContextBuilder:
+    """
+    Assembles graph context for code generation prompts.
+
+    Entities matching the target name seed a breadth-first expansion over the code
+    graph (base classes, callers, callees, contained and imported entities) up to
+    max_depth hops. Each entity is scored by relationship type and distance, summed
+    over every path that reaches it, with a bonus for entities that carry a docstring.
+    The best entities are then packed greedily into token_budget tokens. Token counts
+    of rendered entities are stored on the nodes at ingest (token_count); entities
+    written without one are counted here and cached, so repeated prompts about the
+    same area of the codebase do not tokenise it again.
+
+    Graph reads go through the shared GraphCache, which EdgeManager writes through to
+    and which is reloaded in the background once older than GRAPH_CACHE_TTL.
+    """
+
+    def __init__(self, query_engine=None, token_budget: int = None, max_depth: int = None,
+                 tokenizer: Tokenizer = None, cache_size: int = None):
+        self._query_engine = query_engine
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+        self.max_depth = max_depth or int(os.getenv("CONTEXT_MAX_DEPTH", "2"))
+        self.max_nodes = int(os.getenv("CONTEXT_MAX_NODES", "200"))
+        # Stored counts come from the default tokenizer, so a custom one always counts itself.
+        self.use_stored_counts = tokenizer is None
+        self.tokenizer = tokenizer or Tokenizer()
+        self.cache_size = cache_size or int(os.getenv("CONTEXT_TOKEN_CACHE_SIZE", "10000"))
+        self.logger = logging.getLogger(__name__)
+        # (node id, text hash) -> token count
+        self._token_counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def query_engine(self):
+        if self._query_engine is None:
+            from src.database.graph_cache import shared_graph_cache
+            from src.database.query_engine import QueryEngine
+            self._query_engine = QueryEngine(graph_cache=shared_graph_cache())
+        return self._query_engine
+
+    async def build(self, target: str) -> str:
+        """Context block for prompts about target, or an empty string when nothing relevant is found."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.build_sync, target)
+
+    def build_sync(self, target: str) -> str:
+        seeds = self.query_engine.find_entities(target)
+        if not seeds:
+            return ""
+        scores = self.rank(seeds)
+        entities = {entity["id"]: entity for entity in self.query_engine.get_entities(list(scores))}
+        for node_id, entity in entities.items():
+            if entity["properties"].get("docstring"):
+                scores[node_id] += DOCSTRING_BONUS
+        ranked = sorted(entities, key=lambda node_id: scores[node_id], reverse=True)
+        return self.pack([entities[node_id] for node_id in ranked])
+
+    def rank(self, seeds: List[str]) -> Dict[str, float]:
+        """Scores the seeds and every entity within max_depth hops of them."""
+        scores = {}
+        # Each seed expands on its own, but one lookup per hop covers every seed's frontier.
+        frontiers = {seed: {seed: 1.0} for seed in seeds}
+        visited = {seed: {seed} for seed in seeds}
+        for seed in seeds:
+            scores[seed] = scores.get(seed, 0.0) + 1.0
+        for _ in range(self.max_depth):
+            nodes = {node_id for frontier in frontiers.values() for node_id in frontier}
+            if not nodes or len(scores) >= self.max_nodes:
+                break
+            expanded = self.query_engine.get_neighbour_edges(list(nodes), list(EDGE_WEIGHTS))
+            for seed, frontier in frontiers.items():
+                next_frontier = {}
+                for node_id, weight in frontier.items():
+                    for neighbour, edge_type in expanded.get(node_id, ()):
+                        if neighbour in visited[seed]:
+                            continue
+                        score = weight * HOP_DECAY * EDGE_WEIGHTS[edge_type]
+                        next_frontier[neighbour] = max(next_frontier.get(neighbour, 0.0), score)
+                for node_id, score in next_frontier.items():
+                    scores[node_id] = scores.get(node_id, 0.0) + score
+                visited[seed].update(next_frontier)
+                frontiers[seed] = next_frontier
+        if len(scores) > self.max_nodes:
+            kept = sorted(scores, key=scores.get, reverse=True)[:self.max_nodes]
+            scores = {node_id: scores[node_id] for node_id in kept}
+        return scores
+
+    def pack(self, entities: List[Dict]) -> str:
+        """Renders entities in the given order, skipping any that no longer fit the budget."""
+        parts = []
+        remaining = self.token_budget
+        for entity in entities:
+            text = self.render(entity)
+            if text is None:
+                continue
+            tokens = entity["properties"].get("token_count") if self.use_stored_counts else None
+            if tokens is None:
+                tokens = self.count_tokens(entity["id"], text)
+            if tokens > remaining:
+                continue
+            parts.append(text)
+            remaining -= tokens
+            if remaining <= 0:
+                break
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def render(entity: Dict) -> Optional[str]:
+        return render_entity(entity.get("label"), entity["properties"])
+
+    def count_tokens(self, node_id: str, text: str) -> int:
+        key = (node_id, hashlib.sha1(text.encode()).hexdigest())
+        with self._lock:
+            count = self._token_counts.get(key)
+            if count is not None:
+                self._token_counts.move_to_end(key)
+                return count
+        count = self.tokenizer.count(text)
+        with self._lock:
+            self._token_counts[key] = count
+            while len(self._token_counts) > self.cache_size:
+                self._token_counts.popitem(last=False)
+        return count
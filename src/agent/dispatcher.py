@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from src.agent.concurrency import LoopLocal
+
+_LATENCY_SAMPLES = 1000
+
+
+class AgentDispatcher:
+    """
+    Runs agent requests concurrently with admission control and deadlines.
+
+    At most max_concurrent requests are handled at once; the rest wait in FIFO order.
+    Each request is cancelled when its deadline passes, and cancelling the caller (for
+    example when its WebSocket disconnects) cancels the request and any LLM call it
+    is waiting on. How many requests reach the model at once is bounded separately by
+    the LLM client's per-model limiter.
+    """
+
+    def __init__(self, agent, max_concurrent: int = None, default_timeout: float = None):
+        self.agent = agent
+        self.max_concurrent = max_concurrent or int(os.getenv("AGENT_MAX_CONCURRENT", "256"))
+        self.default_timeout = default_timeout or float(os.getenv("AGENT_REQUEST_TIMEOUT", "120"))
+        self.logger = logging.getLogger(__name__)
+        self._semaphore = LoopLocal(lambda: asyncio.Semaphore(self.max_concurrent))
+        self.active = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+
+    async def submit(self, user_message: str, on_token=None, timeout: float = None) -> str:
+        """Handles a message within timeout seconds; raises asyncio.TimeoutError when the deadline passes."""
+        start = time.monotonic()
+        deadline = timeout or self.default_timeout
+        try:
+            # The deadline covers the wait for a slot as well as the handling itself.
+            response = await asyncio.wait_for(self._handle(user_message, on_token), deadline)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self.logger.warning(f"Agent request exceeded its {deadline}s deadline")
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.completed += 1
+        self._latencies.append(time.monotonic() - start)
+        return response
+
+    async def _handle(self, user_message: str, on_token) -> str:
+        async with self._semaphore.get():
+            self.active += 1
+            try:
+                return await self.agent.handle_user_message(user_message, on_token=on_token)
+            finally:
+                self.active -= 1
+
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "active": self.active,
+            "completed": self.completed,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "latency_p99": latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        }
@@ -0,0 +1,151 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+# (intent, pattern, confidence). Patterns are matched case-insensitively against the message.
+# generate_code writes a module over whatever node has the same name, so only explicit
+# requests for a new module are resolved locally; anything else goes to the LLM.
+INTENT_RULES = [
+    ("generate_code", r"^\s*(?:please\s+)?(?:create|generate|scaffold|write|make|build)\s+(?:me\s+)?(?:a\s+)?"
+                      r"new\s+(?:python\s+)?(?:module|package)\b", 0.9),
+    ("generate_code", r"^\s*(?:please\s+)?(?:create|generate|scaffold)\s+(?:a\s+)?(?:python\s+)?"
+                      r"(?:module|package)\s+(?:named|called)\b", 0.9),
+    ("generate_code", r"^\s*(?:new|scaffold)\s+(?:module|package)\b", 0.9),
+    # Refactoring is only resolved locally for an imperative naming a piece of code.
+    ("refactor_code", r"^\s*(?:please\s+)?(?:refactor|restructure|clean\s+up|tidy\s+up|simplify|reorgani[sz]e)\s+"
+                      r"(?:the\s+|this\s+|that\s+|my\s+|our\s+)?(?:[\w.]+\s+)?"
+                      r"(?:code|codebase|module|package|class|function|method|file)\b", 0.9),
+    ("refactor_code", r"^\s*(?:please\s+)?(?:refactor|restructure|clean\s+up|tidy\s+up|simplify|reorgani[sz]e)\s+"
+                      r"['\"`]?[\w./-]+\.(?:py|js|ts|java)\b", 0.9),
+]
+
+# Negations and edits of existing code. A message matching any of these is never
+# resolved by the rules, whatever else it matches.
+VETO_PATTERNS = [
+    r"\b(?:don'?t|do\s+not|never|not|no|stop|without|instead)\b",
+    r"\b(?:fix|test|tests|testing|update|change|modify|edit|extend|improve|optimi[sz]e|speed\s+up|faster|debug)\b",
+    r"\badd\b.*\b(?:to|into|in)\b",
+    # Questions and definitions are answered, not acted on.
+    r"\?\s*$",
+    r"^\s*(?:what|why|how|when|where|who|which|is|are|can|could|would|should|does|explain|define|tell)\b",
+    r"\b(?:mean|means|meaning|definition|difference)\b",
+]
+
+# How the rules treat typical messages: the intent resolved locally, or None when the
+# message goes to the LLM. Keep this in step with INTENT_RULES and VETO_PATTERNS.
+EXAMPLES = [
+    ("create a new module named billing", "generate_code"),
+    ("new module auth", "generate_code"),
+    ("generate a python package called reports", "generate_code"),
+    ("don't create a new module named billing", None),
+    ("add a retry helper to the http module", None),
+    ("refactor the parser module", "refactor_code"),
+    ("please clean up utils.py", "refactor_code"),
+    ("simplify the DependencyAnalyzer class", "refactor_code"),
+    ("what does refactor mean?", None),
+    ("I want to simplify my life", None),
+    ("simplify this expression: x+0", None),
+    ("can you refactor the parser module?", None),
+    ("refactor the parser module without changing behaviour", None),
+]
+
+# Words that can precede "module" without naming one.
+_NOT_NAMES = {"a", "an", "the", "new", "this", "that", "my", "our", "python", "basic", "simple", "empty"}
+
+ENTITY_PATTERNS = {
+    "module": [
+        r"\b(?:module|package)\s+(?:named|called)\s+['\"`]?([A-Za-z_][\w.]*)",
+        r"\b([A-Za-z_][\w.]*)['\"`]?\s+(?:module|package)\b",
+        r"^\s*(?:new|scaffold)\s+(?:module|package)\s+['\"`]?([A-Za-z_][\w.]*)",
+    ],
+    "class": [r"\bclass\s+(?:named|called)?\s*['\"`]?([A-Z][\w]*)"],
+    "function": [r"\bfunction\s+(?:named|called)?\s*['\"`]?([A-Za-z_]\w*)"],
+    "file": [r"\b([\w./-]+\.(?:py|js|ts|java))\b"],
+}
+
+
+class TierStats:
+    """Call count, resolved count and cumulative latency for one classification tier."""
+
+    def __init__(self):
+        self.calls = 0
+        self.resolved = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds: float, resolved: bool) -> None:
+        self.calls += 1
+        self.resolved += int(resolved)
+        self.total_seconds += seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "resolved": self.resolved,
+            "hit_rate": self.resolved / self.calls if self.calls else 0.0,
+            "avg_latency_ms": 1000 * self.total_seconds / self.calls if self.calls else 0.0,
+        }
+
+
+class IntentClassifier:
+    """
+    Resolves clear-cut intents and entities with compiled regexes, without a model call.
+
+    classify() returns the intent with a confidence score. Messages that match rules of
+    more than one intent, or a code-generation request without a module name, score
+    below the threshold so the caller falls back to the LLM. Negated requests and edits
+    of existing code score zero.
+    """
+
+    def __init__(self, threshold: float = None):
+        self.threshold = threshold or float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+        self._rules = [(intent, re.compile(pattern, re.IGNORECASE), confidence)
+                       for intent, pattern, confidence in INTENT_RULES]
+        self._vetoes = [re.compile(pattern, re.IGNORECASE) for pattern in VETO_PATTERNS]
+        self._entities = {name: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+                          for name, patterns in ENTITY_PATTERNS.items()}
+        self.stats = {"rules": TierStats(), "llm": TierStats()}
+        self._lock = threading.Lock()
+
+    def classify(self, message: str) -> Dict:
+        scores = {}
+        for intent, pattern, confidence in self._rules:
+            if pattern.search(message):
+                scores[intent] = max(scores.get(intent, 0.0), confidence)
+        entities = self.extract_entities(message)
+        if not scores or any(pattern.search(message) for pattern in self._vetoes):
+            return {"intent": "unknown", "entities": entities, "confidence": 0.0}
+        intent, confidence = max(scores.items(), key=lambda item: item[1])
+        if len(scores) > 1:
+            confidence *= 0.5
+        if intent == "generate_code" and "module" not in entities:
+            confidence *= 0.75
+        return {"intent": intent, "entities": entities, "confidence": confidence}
+
+    def extract_entities(self, message: str) -> Dict:
+        entities = {}
+        for name, patterns in self._entities.items():
+            for pattern in patterns:
+                match = pattern.search(message)
+                if match and match.group(1).lower() not in _NOT_NAMES:
+                    entities[name] = match.group(1)
+                    break
+        return entities
+
+    def resolve(self, message: str) -> Optional[Dict]:
+        """Returns the classification if it is confident enough to skip the LLM, else None."""
+        start = time.perf_counter()
+        result = self.classify(message)
+        resolved = result["confidence"] >= self.threshold
+        with self._lock:
+            self.stats["rules"].record(time.perf_counter() - start, resolved)
+        return result if resolved else None
+
+    def record_llm(self, seconds: float, resolved: bool) -> None:
+        with self._lock:
+            self.stats["llm"].record(seconds, resolved)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {tier: stats.as_dict() for tier, stats in self.stats.items()}
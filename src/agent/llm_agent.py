@@ -4,7 +4,7 @@ from src.agent.nlp_processor import NLPProcessor
 from src.agent.action_engine import ActionEngine
 from src.agent.error_handler import ErrorHandler
 from src.agent.thought_logger import ThoughtLogger
-from src.agent.chat_with_ollama import ChatGPT
+from src.agent.chat_with_ollama import get_llm_client
 
 class LLMAgent:
     def __init__(self):
@@ -12,11 +12,15 @@ class LLMAgent:
         self.action_engine = ActionEngine()
         self.error_handler = ErrorHandler()
         self.thought_logger = ThoughtLogger()
-        self.llm_client = ChatGPT()
+        self.llm_client = get_llm_client()
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.INFO)
 
-    async def handle_user_message(self, user_message: str) -> str:
+    async def handle_user_message(self, user_message: str, on_token=None) -> str:
+        """
+        Handles a user message and returns the final response. If on_token is given, it is
+        awaited with each piece of generated text while the model is still producing it.
+        """
         try:
             self.logger.info("Received user message.")
             parsed_input = await self.nlp_processor.parse_input(user_message)
@@ -28,7 +32,7 @@ class LLMAgent:
             parameters = await self.action_engine.extract_parameters(parsed_input)
             self.thought_logger.log_thought(f"Action parameters: {parameters}")
 
-            result = await self.action_engine.execute_action(action, parameters)
+            result = await self.action_engine.execute_action(action, parameters, on_token)
             self.thought_logger.log_thought(f"Action result: {result}")
 
             response = self.generate_response(result)
@@ -47,6 +51,10 @@ class LLMAgent:
         elif result.get("action") == "refactor_code":
             refactored_code = result.get("refactored_code")
             return f"The code has been refactored successfully:\n```python\n{refactored_code}\n```"
+        elif result.get("action") == "error":
+            details = result.get("details")
+            message = details.get("error") if isinstance(details, dict) else details
+            return f"Sorry, something went wrong: {message}"
         else:
             return "Action completed successfully."
 
@@ -0,0 +1,320 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+try:
+    import numpy
+except ImportError:  # Similarity scoring falls back to pure Python over fewer candidates.
+    numpy = None
+
+# Hit times are written to SQLite in batches; they only order the reload after a restart.
+ACCESS_FLUSH_SIZE = int(os.getenv("LLM_CACHE_ACCESS_FLUSH_SIZE", "256"))
+ACCESS_FLUSH_INTERVAL = float(os.getenv("LLM_CACHE_ACCESS_FLUSH_INTERVAL", "30"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+"""
+
+
+def _scope(model: str, options: Optional[dict], params: Optional[dict] = None) -> str:
+    # Responses are only interchangeable for the same model, sampling options and
+    # structured request parameters (such as the module a template is filled in for).
+    scope = f"{model}:{json.dumps(options or {}, sort_keys=True)}"
+    if params:
+        scope += f":{json.dumps(params, sort_keys=True, default=str)}"
+    return scope
+
+
+def _normalise(vector: List[float]) -> array:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return array('f', (value / norm for value in vector))
+
+
+def _best_match(vector: array, candidates: list, threshold: float):
+    """The (key, score) of the candidate most similar to vector, if any reaches threshold."""
+    candidates = [(key, entry_vector) for key, entry_vector in candidates if len(entry_vector) == len(vector)]
+    if not candidates:
+        return None, 0.0
+    if numpy is not None:
+        matrix = numpy.frombuffer(b''.join(entry_vector.tobytes() for _, entry_vector in candidates),
+                                  dtype=numpy.float32).reshape(len(candidates), len(vector))
+        scores = matrix @ numpy.frombuffer(vector.tobytes(), dtype=numpy.float32)
+        best = int(scores.argmax())
+        score = float(scores[best])
+        return (candidates[best][0], score) if score >= threshold else (None, score)
+    best_key, best_score = None, threshold
+    for key, entry_vector in candidates:
+        score = sum(a * b for a, b in zip(vector, entry_vector))
+        if score >= best_score:
+            best_key, best_score = key, score
+    return best_key, best_score
+
+
+class ResponseCache:
+    """
+    Cache of LLM responses with an exact layer and an optional semantic layer.
+
+    The exact layer is keyed on (model, options, params, prompt hash) and answers from
+    memory. params carries the structured inputs a templated prompt was built from;
+    prompts that differ only in those are never treated as similar. When embed is given,
+    a miss also compares the prompt's embedding with the max_candidates most recent
+    prompts of the same scope and reuses a response whose cosine similarity reaches
+    similarity_threshold; scoring runs in a worker thread, vectorised with numpy when it
+    is installed. Both layers expire entries after ttl seconds and evict least recently
+    used entries beyond max_entries. With a path, entries are also written to SQLite
+    (off the event loop) so they survive restarts, and the access times of hits are
+    written back in batches so the most recently used entries are the ones reloaded.
+    """
+
+    def __init__(self, path: str = None, ttl: float = None, max_entries: int = None,
+                 embed: Callable[[str], Awaitable[List[float]]] = None, similarity_threshold: float = None,
+                 max_candidates: int = None):
+        self.path = path if path is not None else os.getenv("LLM_CACHE_PATH")
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", "3600"))
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold or float(os.getenv("LLM_CACHE_SIMILARITY", "0.97"))
+        default_candidates = "2000" if numpy is not None else "200"
+        self.max_candidates = max_candidates or int(os.getenv("LLM_CACHE_MAX_CANDIDATES", default_candidates))
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # key -> (scope, response, expires_at)
+        self._entries = OrderedDict()
+        # scope -> key -> normalised embedding, for the semantic layer
+        self._vectors = {}
+        # Embeddings computed by a missed get(), reused when the response is put.
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        # Serialises use of the SQLite connection, which is shared by worker threads.
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        # key -> time of a hit not yet written to SQLite
+        self._accessed = {}
+        self._accessed_flushed = time.monotonic()
+
+    def _opened(self) -> bool:
+        return not self.path or (self._conn is not None and self._pid == os.getpid())
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        with self._db_lock:
+            if self._conn is None or self._pid != os.getpid():
+                conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                rows = conn.execute(
+                    "SELECT key, scope, response, embedding, expires_at FROM responses "
+                    "WHERE expires_at > ? ORDER BY last_access DESC LIMIT ?",
+                    (time.time(), self.max_entries)
+                ).fetchall()
+                with self._lock:
+                    self._load(rows)
+                self._conn = conn
+                self._pid = os.getpid()
+        return self._conn
+
+    def _load(self, rows: list) -> None:
+        for key, scope, response, embedding, expires_at in reversed(rows):
+            self._entries[key] = (scope, response, expires_at)
+            if embedding is not None:
+                vector = array('f')
+                vector.frombytes(embedding)
+                self._vectors.setdefault(scope, OrderedDict())[key] = vector
+
+    @staticmethod
+    def key(model: str, prompt: str, options: dict = None, params: dict = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(_scope(model, options, params).encode())
+        digest.update(b'\0')
+        digest.update(prompt.encode())
+        return digest.hexdigest()
+
+    def get_exact(self, model: str, prompt: str, options: dict = None, params: dict = None) -> Optional[str]:
+        key = self.key(model, prompt, options, params)
+        if not self._opened():
+            self._connection()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self._record_access(key)
+            self.hits += 1
+            return entry[1]
+
+    async def get(self, model: str, prompt: str, options: dict = None, params: dict = None,
+                  semantic: bool = True) -> Optional[str]:
+        """
+        Cached response for the prompt, or None. semantic=False restricts the lookup to the
+        exact layer, for prompts whose answer depends on every detail of the input.
+        """
+        if not self._opened():
+            # The first lookup loads the persisted entries; keep that off the event loop.
+            await asyncio.to_thread(self._connection)
+        response = self.get_exact(model, prompt, options, params)
+        if response is None and self.embed is not None and semantic:
+            response = await self._get_similar(model, prompt, options, params)
+        if response is not None:
+            if self._access_flush_due():
+                await asyncio.to_thread(self._flush_access)
+            return response
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def _get_similar(self, model: str, prompt: str, options: dict, params: dict) -> Optional[str]:
+        try:
+            vector = _normalise(await self.embed(prompt))
+        except Exception as e:
+            self.logger.warning(f"Embedding failed; skipping the semantic cache: {e}")
+            return None
+        scope = _scope(model, options, params)
+        with self._lock:
+            self._pending[self.key(model, prompt, options, params)] = vector
+            while len(self._pending) > 64:
+                self._pending.popitem(last=False)
+            vectors = self._vectors.get(scope)
+            if not vectors:
+                return None
+            # Most recently used first; older prompts beyond the cap are not scored.
+            candidates = []
+            for key in reversed(vectors):
+                candidates.append((key, vectors[key]))
+                if len(candidates) >= self.max_candidates:
+                    break
+        best_key, _ = await asyncio.to_thread(_best_match, vector, candidates, self.similarity_threshold)
+        if best_key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(best_key)
+            if entry is None or entry[2] <= now:
+                self._drop(best_key)
+                self._forget_vector(scope, best_key)
+                return None
+            self._entries.move_to_end(best_key)
+            self._vectors[scope].move_to_end(best_key)
+            self._record_access(best_key)
+            self.semantic_hits += 1
+            return entry[1]
+
+    async def put(self, model: str, prompt: str, response: str, options: dict = None, params: dict = None) -> None:
+        key = self.key(model, prompt, options, params)
+        scope = _scope(model, options, params)
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            vector = self._pending.pop(key, None)
+            self._entries[key] = (scope, response, expires_at)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                vectors = self._vectors.setdefault(scope, OrderedDict())
+                vectors[key] = vector
+                vectors.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                old_key, (old_scope, _, _) = self._entries.popitem(last=False)
+                self._forget_vector(old_scope, old_key)
+                evicted.append((old_key,))
+                self._accessed.pop(old_key, None)
+            accessed = self._take_accessed()
+        if self.path:
+            row = (key, scope, response, vector.tobytes() if vector is not None else None, expires_at, now)
+            await asyncio.to_thread(self._persist, row, evicted, accessed, now)
+
+    def _persist(self, row: tuple, evicted: list, accessed: list, now: float) -> None:
+        conn = self._connection()
+        with self._db_lock:
+            try:
+                conn.execute("BEGIN")
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, scope, response, embedding, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                if accessed:
+                    conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?", accessed)
+                if evicted:
+                    conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self.logger.warning(f"Failed to persist cached response: {e}")
+
+    def _record_access(self, key: str) -> None:
+        if self.path:
+            self._accessed[key] = time.time()
+
+    def _take_accessed(self) -> list:
+        accessed = [(accessed_at, key) for key, accessed_at in self._accessed.items()]
+        self._accessed = {}
+        self._accessed_flushed = time.monotonic()
+        return accessed
+
+    def _access_flush_due(self) -> bool:
+        return bool(self._accessed) and (len(self._accessed) >= ACCESS_FLUSH_SIZE or
+                                         time.monotonic() - self._accessed_flushed >= ACCESS_FLUSH_INTERVAL)
+
+    def _flush_access(self) -> None:
+        """Writes the access times of recent hits in one statement batch."""
+        with self._lock:
+            accessed = self._take_accessed()
+        if not accessed:
+            return
+        conn = self._connection()
+        with self._db_lock:
+            try:
+                conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?", accessed)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Failed to record cached response access times: {e}")
+
+    def _forget_vector(self, scope: str, key: str) -> None:
+        vectors = self._vectors.get(scope)
+        if vectors is not None:
+            vectors.pop(key, None)
+            if not vectors:
+                del self._vectors[scope]
+
+    def _drop(self, key: str) -> None:
+        # Expired rows are deleted from SQLite by the next put(), and never loaded again.
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._forget_vector(entry[0], key)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
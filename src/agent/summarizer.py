@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from src.agent.concurrency import LoopLocal
+from src.parsing.tokenizer import Tokenizer
+
+SUMMARY_SYSTEM_PROMPT = "You are a skilled text summarizer."
+
+
+class Summarizer:
+    """
+    Map-reduce summarisation of text that does not fit a model's context.
+
+    Text is split by token count, chunks are summarised concurrently (at most
+    concurrency requests at a time), and the joined summaries are reduced again the
+    same way until they fit within max_tokens, so latency grows with the depth of the
+    reduction rather than the number of chunks. Chunk summaries are cached by content
+    hash, so repeated and overlapping inputs are not summarised twice.
+    """
+
+    def __init__(self, complete: Callable[[str, str], Awaitable[str]], concurrency: int = None,
+                 cache_size: int = None, tokenizer: Tokenizer = None):
+        self.complete = complete
+        self.concurrency = concurrency or int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+        self.cache_size = cache_size or int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+        self.tokenizer = tokenizer or Tokenizer()
+        self.logger = logging.getLogger(__name__)
+        self._cache = OrderedDict()
+        self._semaphore = LoopLocal(lambda: asyncio.Semaphore(self.concurrency))
+
+    async def summarize(self, text: str, max_tokens: int, overlap_ratio: float = 0.1) -> str:
+        tokens = self.tokenizer.count(text)
+        if tokens <= max_tokens:
+            return text
+        chunks = self.tokenizer.split(text, max_tokens, int(max_tokens * overlap_ratio))
+        self.logger.info(f"Summarising {tokens} tokens in {len(chunks)} chunks")
+        summaries = await asyncio.gather(*(self._summarize_chunk(chunk) for chunk in chunks))
+        joined = "\n\n".join(summaries)
+        if self.tokenizer.count(joined) >= tokens:
+            # The model is not shrinking the text; cut it rather than loop forever.
+            self.logger.warning("Summaries did not shrink the text; truncating to the token limit")
+            return self.tokenizer.split(joined, max_tokens)[0]
+        return await self.summarize(joined, max_tokens, overlap_ratio)
+
+    async def _summarize_chunk(self, chunk: str) -> str:
+        key = hashlib.sha256(chunk.encode()).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        async with self._semaphore.get():
+            summary = await self.complete(
+                SUMMARY_SYSTEM_PROMPT,
+                f"Summarize the following text, preserving key information:\n\n{chunk}",
+            )
+        self._cache[key] = summary
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return summary
@@ -1,8 +1,13 @@
+import asyncio
+import logging
+import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.api.endpoints import projects, auth  # Added auth
 from src.api.websockets import websocket_service
 from src.api.gateway import api_gateway
+from src.database.database import Neo4jConnection
+from src.database.schema import ensure_schema
 
 app = FastAPI(title="GBCMS API Layer")
 
@@ -25,4 +30,21 @@ app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])  #
 # WebSocket routes
 @app.websocket("/ws")
 async def websocket_endpoint(websocket):
-    await websocket_service.handle_connection(websocket)
\ No newline at end of file
+    await websocket_service.handle_connection(websocket)
+
+
+@app.on_event("startup")
+async def bootstrap_graph_schema():
+    # Best effort: if Neo4j is not reachable yet, EdgeManager creates the schema on first use.
+    try:
+        await asyncio.to_thread(ensure_schema, Neo4jConnection())
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Deferring graph schema bootstrap: {e}")
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    # The agent stack is loaded on first use, so there is only a client to close if it was.
+    chat_module = sys.modules.get("src.agent.chat_with_ollama")
+    if chat_module is not None:
+        await chat_module.get_llm_client().close()
@@ -1,19 +1,174 @@
+import asyncio
+import json
+import math
+import os
 from fastapi import WebSocket, WebSocketDisconnect
 from typing import List
 
+from src.database.log_store import ExecutionLogStore
+from src.database.node_manager import NodeManager
+from src.database.query_engine import AsyncQueryEngine
+from src.database.status_buffer import TERMINAL_STATUSES
+
+LOG_POLL_INTERVAL = float(os.getenv("LOG_POLL_INTERVAL", "0.5"))
+
 active_connections: List[WebSocket] = []
 
+_log_store = None
+_node_manager = None
+_async_engine = None
+_dispatcher = None
+
+
+def _stores():
+    global _log_store, _node_manager, _async_engine
+    if _log_store is None:
+        _node_manager = NodeManager()
+        _log_store = ExecutionLogStore(_node_manager.query_engine)
+        # Reads run on a thread pool sized to the connection pool rather than the loop's
+        # default executor, so followers queue for a connection instead of for a thread.
+        _async_engine = AsyncQueryEngine(_node_manager.query_engine)
+    return _log_store, _node_manager, _async_engine
+
+
+def _agent_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        # Imported on first use: the agent pulls in the LLM client and the database layer.
+        from src.agent.dispatcher import AgentDispatcher
+        from src.agent.llm_agent import LLMAgent
+        _dispatcher = AgentDispatcher(LLMAgent())
+    return _dispatcher
+
+
 async def handle_connection(websocket: WebSocket):
     await websocket.accept()
     active_connections.append(websocket)
+    followers = {}
+    chats = set()
     try:
         while True:
             data = await websocket.receive_text()
+            message = _parse_message(data)
+            message_type = message.get("type") if message is not None else None
+            if message_type in ("subscribe_logs", "unsubscribe_logs", "chat"):
+                error = _validate(message)
+                if error is not None:
+                    await websocket.send_text(json.dumps({
+                        "type": "error", "request_type": message_type,
+                        "request_id": message.get("request_id"), "error": error,
+                    }))
+                    continue
+            if message_type == "subscribe_logs":
+                execution_id = message["execution_id"]
+                if execution_id not in followers or followers[execution_id].done():
+                    followers[execution_id] = asyncio.create_task(
+                        follow_logs(websocket, execution_id, message["after_seq"])
+                    )
+                continue
+            if message_type == "chat":
+                # Runs alongside this loop; it is cancelled below if the client disconnects.
+                chat = asyncio.create_task(stream_chat(
+                    websocket, message["message"], message.get("request_id"), message["timeout"]
+                ))
+                chats.add(chat)
+                chat.add_done_callback(chats.discard)
+                continue
+            if message_type == "unsubscribe_logs":
+                follower = followers.pop(message["execution_id"], None)
+                if follower is not None:
+                    follower.cancel()
+                continue
             # Handle incoming messages
             await broadcast(f"Message received: {data}")
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        pass
+    finally:
+        if websocket in active_connections:
+            active_connections.remove(websocket)
+        for task in [*followers.values(), *chats]:
+            task.cancel()
+
+
+def _parse_message(data: str):
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) else None
+
+
+def _validate(message: dict):
+    """
+    Checks and normalises the fields of a subscribe, unsubscribe or chat message in place.
+    Returns an error description for the client, or None when the message can be dispatched.
+    """
+    if message["type"] in ("subscribe_logs", "unsubscribe_logs"):
+        execution_id = message.get("execution_id")
+        if isinstance(execution_id, bool) or not isinstance(execution_id, (str, int)) or execution_id == "":
+            return "execution_id must be a non-empty string or an integer"
+        if message["type"] == "subscribe_logs":
+            try:
+                message["after_seq"] = int(message.get("after_seq", -1))
+            except (TypeError, ValueError):
+                return "after_seq must be an integer"
+        return None
+    if not isinstance(message.get("message", ""), str):
+        return "message must be a string"
+    message.setdefault("message", "")
+    timeout = message.get("timeout")
+    if timeout is not None:
+        try:
+            timeout = float(timeout)
+        except (TypeError, ValueError):
+            return "timeout must be a number of seconds"
+        if isinstance(message["timeout"], bool) or not math.isfinite(timeout) or timeout <= 0:
+            return "timeout must be a positive number of seconds"
+    message["timeout"] = timeout
+    return None
+
+
+async def follow_logs(websocket: WebSocket, execution_id, after_seq: int = -1):
+    """
+    Pushes log chunks for an execution as they are appended, starting after after_seq.
+    Only chunks newer than the last one sent are read on each poll, and following
+    stops once the execution has finished and every chunk has been delivered.
+    """
+    log_store, node_manager, async_engine = _stores()
+    while True:
+        # Read the status first so chunks written just before completion are not missed.
+        status = await async_engine.run(node_manager.get_execution_status, execution_id)
+        chunks = await async_engine.run(log_store.read, execution_id, after_seq)
+        for seq, stream, data in chunks:
+            await websocket.send_text(json.dumps({
+                "type": "log", "execution_id": execution_id, "seq": seq, "stream": stream, "data": data,
+            }))
+            after_seq = seq
+        if chunks:
+            continue
+        if status and status[0] in TERMINAL_STATUSES:
+            await websocket.send_text(json.dumps({
+                "type": "log_end", "execution_id": execution_id, "status": status[0], "seq": after_seq,
+            }))
+            return
+        await asyncio.sleep(LOG_POLL_INTERVAL)
+
+
+async def stream_chat(websocket: WebSocket, user_message: str, request_id=None, timeout=None):
+    """Runs a chat message through the agent, sending generated text to the client as it is produced."""
+    async def send_token(token: str):
+        await websocket.send_text(json.dumps({"type": "chat_token", "request_id": request_id, "data": token}))
+
+    try:
+        response = await _agent_dispatcher().submit(user_message, on_token=send_token, timeout=timeout)
+    except asyncio.TimeoutError:
+        await websocket.send_text(json.dumps({
+            "type": "chat_error", "request_id": request_id, "error": "The request exceeded its deadline.",
+        }))
+        return
+    await websocket.send_text(json.dumps({"type": "chat_done", "request_id": request_id, "response": response}))
+
 
 async def broadcast(message: str):
     for connection in active_connections:
-        await connection.send_text(message)
\ No newline at end of file
+        await connection.send_text(message)
@@ -0,0 +1,266 @@
+import csv
+import glob
+import logging
+import os
+import re
+import subprocess
+from typing import Iterable, List
+
+from src.parsing.graph_builder import build_file_graph
+from src.parsing.incremental_parser import FileManifest, hash_file, manifest_entry
+from .schema import CODE_ENTITY_LABEL
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet shards are optional; CSV needs nothing extra.
+    pyarrow = None
+
+DEFAULT_SHARD_ROWS = int(os.getenv("GRAPH_IMPORT_SHARD_ROWS", "1000000"))
+
+# neo4j-admin reads property types from the header; every label shares one column set.
+NODE_COLUMNS = [
+    ("id:ID", "id"), (":LABEL", "labels"), ("name", "name"), ("qualified_name", "qualified_name"),
+    ("path", "path"), ("file", "file"), ("language", "language"), ("module", "module"),
+    ("lineno:int", "lineno"), ("end_lineno:int", "end_lineno"), ("docstring", "docstring"),
+    ("token_count:int", "token_count"),
+]
+EDGE_COLUMNS = [
+    (":START_ID", "source_id"), (":END_ID", "target_id"), (":TYPE", "edge_type"),
+    ("id", "id"), ("lineno:int", "lineno"),
+]
+
+
+class _ShardWriter:
+    """Writes rows to numbered CSV or Parquet shards of at most shard_rows rows each."""
+
+    def __init__(self, output_dir: str, prefix: str, columns: list, shard_rows: int, file_format: str):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.columns = columns
+        self.shard_rows = shard_rows
+        self.file_format = file_format
+        self.files: List[str] = []
+        self._rows = []
+        self._handle = None
+        self._writer = None
+        self._count = 0
+        if file_format == 'csv':
+            header_path = os.path.join(output_dir, f"{prefix}_header.csv")
+            with open(header_path, 'w', newline='') as header:
+                csv.writer(header).writerow([header_name for header_name, _ in columns])
+            self.files.append(header_path)
+
+    def write(self, row: dict) -> None:
+        values = [row.get(key) for _, key in self.columns]
+        if self.file_format == 'csv':
+            if self._writer is None:
+                self._handle = open(self._next_path(), 'w', newline='')
+                self._writer = csv.writer(self._handle)
+            self._writer.writerow(['' if value is None else value for value in values])
+        else:
+            self._rows.append(values)
+        self._count += 1
+        if self._count >= self.shard_rows:
+            self._flush()
+
+    def _next_path(self) -> str:
+        path = os.path.join(self.output_dir, f"{self.prefix}_{len(self.files):05d}.{self.file_format}")
+        self.files.append(path)
+        return path
+
+    def _flush(self) -> None:
+        if self.file_format == 'csv':
+            if self._handle is not None:
+                self._handle.close()
+            self._handle = None
+            self._writer = None
+        elif self._rows:
+            columns = list(zip(*self._rows))
+            table = pyarrow.table({header: list(values) for (header, _), values in zip(self.columns, columns)})
+            pyarrow.parquet.write_table(table, self._next_path())
+            self._rows = []
+        self._count = 0
+
+    def close(self) -> None:
+        self._flush()
+
+
+class BulkImporter:
+    """
+    Streams CodeParser output into node and relationship shards and builds a fresh
+    database from them with neo4j-admin. Use the batched Cypher writes in EdgeManager
+    for incremental updates; this path is for first-time loads.
+
+    With manifest_path, the files written to the shards are also recorded in an
+    incremental-parse manifest, which replaces the one at manifest_path once the shards
+    have been loaded. The first incremental run then only re-parses files that changed
+    since the import.
+    """
+
+    def __init__(self, output_dir: str, shard_rows: int = DEFAULT_SHARD_ROWS, file_format: str = 'csv',
+                 manifest_path: str = None):
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported shard format: {file_format}")
+        if file_format == 'parquet' and pyarrow is None:
+            raise ValueError("Parquet shards require pyarrow")
+        self.output_dir = output_dir
+        self.shard_rows = shard_rows
+        self.file_format = file_format
+        self.manifest_path = manifest_path
+        # Built next to the shards and only moved into place after a successful load.
+        self.staged_manifest_path = os.path.join(output_dir, 'manifest.json')
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write_shards(self, results: Iterable[dict], directory_path: str, language: str) -> dict:
+        """
+        Converts per-file results into shards. Referenced nodes (imported modules, callees)
+        appear in many files, so node ids are de-duplicated before they are written.
+        Returns the shard file lists for nodes and relationships.
+        """
+        self._remove_shards(language)
+        manifest = self._staged_manifest(language)
+        nodes = _ShardWriter(self.output_dir, f"nodes_{language.lower()}", NODE_COLUMNS, self.shard_rows, self.file_format)
+        edges = _ShardWriter(self.output_dir, f"edges_{language.lower()}", EDGE_COLUMNS, self.shard_rows, self.file_format)
+        seen_nodes = set()
+        node_count = edge_count = 0
+        for result in results:
+            rel_path = os.path.relpath(result['file'], directory_path)
+            graph = build_file_graph(rel_path, language, result)
+            if manifest is not None:
+                manifest.entries[rel_path] = manifest_entry(language, os.stat(result['file']),
+                                                            hash_file(result['file']), graph)
+            for node in graph.nodes.values():
+                if node['id'] in seen_nodes:
+                    continue
+                seen_nodes.add(node['id'])
+                nodes.write(dict(node['properties'], id=node['id'], labels=f"{CODE_ENTITY_LABEL};{node['label']}"))
+                node_count += 1
+            for edge in graph.edges.values():
+                edges.write(dict(edge['attributes'], source_id=edge['source_id'],
+                                 target_id=edge['target_id'], edge_type=edge['edge_type']))
+                edge_count += 1
+        nodes.close()
+        edges.close()
+        if manifest is not None:
+            manifest.save()
+        self.logger.info(f"Wrote {node_count} nodes and {edge_count} relationships to {self.output_dir}")
+        return {'nodes': nodes.files, 'relationships': edges.files}
+
+    def _remove_shards(self, language: str) -> None:
+        # Leftovers of an earlier, larger run would otherwise be picked up by the import.
+        for kind in ('nodes', 'edges'):
+            for path in glob.glob(os.path.join(self.output_dir, f"{kind}_{language.lower()}_*")):
+                os.remove(path)
+
+    def _staged_manifest(self, language: str):
+        if not self.manifest_path:
+            return None
+        manifest = FileManifest(self.staged_manifest_path)
+        # Each language's entries are rewritten along with its shards.
+        manifest.entries = {path: entry for path, entry in manifest.entries.items() if entry['language'] != language}
+        return manifest
+
+    def _commit_manifest(self) -> None:
+        if self.manifest_path and os.path.exists(self.staged_manifest_path):
+            os.replace(self.staged_manifest_path, self.manifest_path)
+
+    def import_directory(self, code_parser, directory_path: str, language: str, workers: int = 1) -> dict:
+        return self.write_shards(code_parser.iter_parse_directory(directory_path, language, workers),
+                                 directory_path, language)
+
+    def run_admin_import(self, database: str = None, admin_path: str = None) -> None:
+        """
+        Builds a fresh database from every shard in output_dir with neo4j-admin, using
+        the 4.4 or 5.x command line depending on the installed version.
+        The database must be stopped; uniqueness constraints are created by ensure_schema
+        the first time an EdgeManager uses it afterwards.
+        """
+        database = database or os.getenv("NEO4J_DATABASE", "neo4j")
+        admin_path = admin_path or os.getenv("NEO4J_ADMIN", "neo4j-admin")
+        if self._admin_major_version(admin_path) >= 5:
+            command = [admin_path, 'database', 'import', 'full', database, '--overwrite-destination=true']
+        else:
+            if self.file_format == 'parquet':
+                raise ValueError("Parquet shards require neo4j-admin 5.x")
+            command = [admin_path, 'import', f"--database={database}", '--force']
+        command += [
+            '--skip-duplicate-nodes=true',
+            '--skip-bad-relationships=true',
+            # Docstrings span several lines.
+            '--multiline-fields=true',
+        ]
+        if self.file_format == 'parquet':
+            command.append('--input-type=parquet')
+        for group in self._shard_groups('nodes'):
+            command.append(f"--nodes={','.join(group)}")
+        for group in self._shard_groups('edges'):
+            command.append(f"--relationships={','.join(group)}")
+        self.logger.info(f"Running bulk import into database {database}")
+        subprocess.run(command, check=True)
+        self._commit_manifest()
+
+    def _admin_major_version(self, admin_path: str) -> int:
+        version = os.getenv("NEO4J_ADMIN_VERSION")
+        if not version:
+            output = subprocess.run([admin_path, '--version'], check=True, capture_output=True, text=True).stdout
+            match = re.search(r"(\d+)\.\d+", output)
+            if match is None:
+                raise ValueError(f"Could not read the neo4j-admin version from: {output!r}")
+            version = match.group(1)
+        return int(version.split('.')[0])
+
+    def load_with_cypher(self, edge_manager) -> None:
+        """
+        Loads the CSV shards through EdgeManager's batched UNWIND writes. This is the
+        stand-in for environments without neo4j-admin access, such as a local server.
+        """
+        if self.file_format != 'csv':
+            raise ValueError("Cypher loading reads CSV shards")
+        for group in self._shard_groups('nodes'):
+            for path in group[1:]:
+                edge_manager.upsert_nodes(self._read_nodes(path))
+        for group in self._shard_groups('edges'):
+            for path in group[1:]:
+                edge_manager.create_edges(self._read_edges(path))
+        self._commit_manifest()
+
+    def _shard_groups(self, kind: str) -> List[List[str]]:
+        """Groups shard files per language, with the CSV header file first in each group."""
+        groups = []
+        for header in sorted(glob.glob(os.path.join(self.output_dir, f"{kind}_*_header.csv"))):
+            prefix = header[:-len('_header.csv')]
+            groups.append([header] + sorted(glob.glob(f"{prefix}_[0-9]*.csv")))
+        if self.file_format == 'parquet':
+            shards = sorted(glob.glob(os.path.join(self.output_dir, f"{kind}_*.parquet")))
+            if shards:
+                groups.append(shards)
+        return groups
+
+    def _read_rows(self, path: str, columns: list):
+        with open(path, newline='') as shard:
+            for values in csv.reader(shard):
+                row = {}
+                for (header_name, key), value in zip(columns, values):
+                    if value != '':
+                        row[key] = int(value) if header_name.endswith(':int') else value
+                yield row
+
+    def _read_nodes(self, path: str) -> list:
+        nodes = []
+        for row in self._read_rows(path, NODE_COLUMNS):
+            label = row.pop('labels').split(';')[-1]
+            nodes.append({'id': row['id'], 'label': label, 'properties': row})
+        return nodes
+
+    def _read_edges(self, path: str) -> list:
+        edges = []
+        for row in self._read_rows(path, EDGE_COLUMNS):
+            edges.append({
+                'source_id': row.pop('source_id'),
+                'target_id': row.pop('target_id'),
+                'edge_type': row.pop('edge_type'),
+                'attributes': row,
+            })
+        return edges
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _connection_kwargs() -> dict:
+    return {
+        'dbname': os.getenv("POSTGRES_DB", "your_db"),
+        'user': os.getenv("POSTGRES_USER", "your_user"),
+        'password': os.getenv("POSTGRES_PASSWORD", "your_password"),
+        'host': os.getenv("POSTGRES_HOST", "localhost"),
+        'port': os.getenv("POSTGRES_PORT", "5432"),
+    }
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection that carries its own pool bookkeeping, so the state dies with the connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = None
+        # Names of the server-side prepared statements this connection already holds.
+        self.prepared = set()
+
+
+class ConnectionPool:
+    """
+    Thread-safe Postgres connection pool.
+
+    Connections run in autocommit mode, so single statements commit on their own and
+    reads never pay for an explicit COMMIT. Checkout blocks while all max_size
+    connections are in use. Returned connections stay open on the idle list until
+    they break, so their prepared statements stay valid. Connections idle for longer
+    than health_check_interval are pinged before they are handed out, and broken ones
+    are replaced.
+    """
+
+    def __init__(self, min_size: int = None, max_size: int = None, health_check_interval: float = None):
+        self.min_size = min_size or int(os.getenv("POSTGRES_POOL_MIN", "1"))
+        self.max_size = max_size or int(os.getenv("POSTGRES_POOL_MAX", "10"))
+        self.health_check_interval = health_check_interval or float(os.getenv("POSTGRES_HEALTH_CHECK_INTERVAL", "30"))
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        # Most recently returned last, so checkout reuses warm connections first.
+        self._idle = []
+        self._warmed = False
+
+    def _connect(self) -> PooledConnection:
+        conn = psycopg2.connect(connection_factory=PooledConnection, **_connection_kwargs())
+        conn.last_used = time.monotonic()
+        return conn
+
+    def _warm(self) -> None:
+        # Done on first use so that importing modules does not open connections.
+        with self._lock:
+            if self._warmed:
+                return
+            self._warmed = True
+        opened = [self._connect() for _ in range(min(self.min_size, self.max_size))]
+        with self._lock:
+            self._idle.extend(opened)
+
+    def _checkout(self) -> PooledConnection:
+        self._warm()
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+            elif not self._healthy(conn):
+                self._discard(conn)
+                continue
+            if not conn.autocommit:
+                conn.autocommit = True
+            return conn
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            self.logger.warning("Discarding unhealthy Postgres connection")
+            return False
+
+    def _discard(self, conn: PooledConnection) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self._discard(conn)
+                raise
+            except Exception:
+                self._release(conn)
+                raise
+            else:
+                self._release(conn)
+        finally:
+            self._slots.release()
+
+    def _release(self, conn: PooledConnection) -> None:
+        if conn.closed:
+            return
+        try:
+            # A caller that switched autocommit off may have left a transaction open.
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._warmed = False
+        for conn in idle:
+            self._discard(conn)
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Process-wide pool shared by every QueryEngine."""
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_lock:
+            if _shared_pool is None:
+                _shared_pool = ConnectionPool()
+    return _shared_pool
@@ -1,18 +1,47 @@
 import os
+import threading
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# One pooled driver per process; every Neo4jConnection borrows sessions from it.
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_driver():
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                uri = os.getenv("NEO4J_URI")
+                user = os.getenv("NEO4J_USER")
+                password = os.getenv("NEO4J_PASSWORD")
+                _driver = GraphDatabase.driver(
+                    uri,
+                    auth=(user, password),
+                    max_connection_pool_size=int(os.getenv("NEO4J_MAX_POOL_SIZE", "50")),
+                    connection_acquisition_timeout=float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60")),
+                )
+    return _driver
+
+
+def close_driver():
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
 class Neo4jConnection:
     def __init__(self):
-        uri = os.getenv("NEO4J_URI")
-        user = os.getenv("NEO4J_USER")
-        password = os.getenv("NEO4J_PASSWORD")
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.driver = get_driver()
 
     def close(self):
-        self.driver.close()
+        # The driver is shared by the whole process; use close_driver() on shutdown.
+        pass
 
     def get_session(self):
-        return self.driver.session()
\ No newline at end of file
+        return self.driver.session()
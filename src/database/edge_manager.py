@@ -1,51 +1,214 @@
+import os
+import re
+from collections import defaultdict
 from .database import Neo4jConnection
+from .graph_cache import shared_graph_cache
+from .schema import CODE_ENTITY_LABEL, RELATIONSHIP_TYPES, ensure_schema
+
+DEFAULT_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "5000"))
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _check_identifier(name: str) -> str:
+    """Labels and relationship types cannot be parameterised, so they are validated before interpolation."""
+    if not _IDENTIFIER.match(name or ""):
+        raise ValueError(f"Invalid label or relationship type: {name!r}")
+    return name
+
+
+def _check_relationship_type(edge_type: str) -> str:
+    """
+    Untyped lookups union one indexed branch per known type, so an edge of any other type
+    could never be found again; such types are rejected when the edge is written.
+    """
+    if _check_identifier(edge_type) not in RELATIONSHIP_TYPES:
+        raise ValueError(f"Unknown relationship type {edge_type!r}; expected one of {', '.join(RELATIONSHIP_TYPES)}")
+    return edge_type
+
+
+def _match_edges(where: str, edge_type: str = None) -> str:
+    """
+    Builds a type-qualified relationship match so lookups use the per-type id indexes.
+    Without an edge type, one indexed branch per known relationship type is unioned.
+    """
+    if edge_type:
+        return f"MATCH ()-[r:{_check_identifier(edge_type)}]->() WHERE {where}"
+    branches = " UNION ".join(
+        f"MATCH ()-[r:{rel_type}]->() WHERE {where} RETURN r" for rel_type in RELATIONSHIP_TYPES
+    )
+    return f"CALL {{ {branches} }}"
+
+
+def _batches(rows: list, batch_size: int):
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
 
 class EdgeManager:
-    def __init__(self):
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, graph_cache=None):
         self.conn = Neo4jConnection()
+        self.batch_size = batch_size
+        # GraphCache kept coherent by writing through on every topology change; defaults to
+        # the process-wide cache that QueryEngine reads from.
+        self.graph_cache = graph_cache if graph_cache is not None else shared_graph_cache()
+
+    def _session(self):
+        # The schema is bootstrapped on first use rather than on construction, so modules
+        # that build an EdgeManager at import time do not need a reachable Neo4j to load.
+        ensure_schema(self.conn)
+        return self.conn.get_session()
 
     def create_edge(self, source_node_id: str, target_node_id: str, edge_type: str, attributes: dict) -> dict:
-        with self.conn.get_session() as session:
+        with self._session() as session:
             result = session.run(
                 f"""
-                MATCH (a), (b)
-                WHERE a.id = $source_id AND b.id = $target_id
-                CREATE (a)-[r:{edge_type} $attributes]->(b)
+                MATCH (a:{CODE_ENTITY_LABEL} {{id: $source_id}}), (b:{CODE_ENTITY_LABEL} {{id: $target_id}})
+                CREATE (a)-[r:{_check_relationship_type(edge_type)} $attributes]->(b)
                 RETURN r
                 """,
                 source_id=source_node_id,
                 target_id=target_node_id,
                 attributes=attributes
             )
-            return result.single()["r"]
+            record = result.single()
+        if record is None:
+            raise ValueError(f"Cannot create {edge_type} edge: node {source_node_id} or {target_node_id} does not exist")
+        edge = record["r"]
+        if self.graph_cache is not None:
+            self.graph_cache.add_edge((attributes or {}).get("id"), source_node_id, target_node_id, edge_type)
+        return edge
+
+    def create_edges(self, edges: list, batch_size: int = None) -> int:
+        """
+        Creates many edges with one UNWIND statement per batch and relationship type.
+
+        Each edge is a dict with ``source_id``, ``target_id``, ``edge_type`` and
+        optional ``attributes``. Edges whose attributes carry an ``id`` are merged on it,
+        so replaying the same edges does not duplicate them. Returns the number of
+        relationships written.
+        """
+        batch_size = batch_size or self.batch_size
+        rows_by_key = defaultdict(list)
+        for edge in edges:
+            attributes = edge.get("attributes") or {}
+            rows_by_key[(_check_relationship_type(edge["edge_type"]), "id" in attributes)].append({
+                "source_id": edge["source_id"],
+                "target_id": edge["target_id"],
+                "attributes": attributes,
+            })
+
+        created = 0
+        with self._session() as session:
+            for (edge_type, has_id), rows in rows_by_key.items():
+                write = (f"MERGE (a)-[r:{edge_type} {{id: row.attributes.id}}]->(b)" if has_id
+                         else f"CREATE (a)-[r:{edge_type}]->(b)")
+                query = f"""
+                UNWIND $rows AS row
+                MATCH (a:{CODE_ENTITY_LABEL} {{id: row.source_id}}), (b:{CODE_ENTITY_LABEL} {{id: row.target_id}})
+                {write}
+                SET r = row.attributes
+                RETURN count(r) AS created
+                """
+                for batch in _batches(rows, batch_size):
+                    created += session.run(query, rows=batch).single()["created"]
+        if self.graph_cache is not None:
+            for (edge_type, _), rows in rows_by_key.items():
+                for row in rows:
+                    self.graph_cache.add_edge(row["attributes"].get("id"), row["source_id"], row["target_id"], edge_type)
+        return created
+
+    def upsert_nodes(self, nodes: list, batch_size: int = None) -> int:
+        """
+        Creates or updates many nodes, merging on ``id``, one UNWIND statement per batch and label.
+
+        Each node is a dict with ``id``, ``label`` and optional ``properties``.
+        Nodes are merged on the shared CodeEntity label so the write uses its unique index.
+        Returns the number of nodes written.
+        """
+        batch_size = batch_size or self.batch_size
+        rows_by_label = defaultdict(list)
+        for node in nodes:
+            rows_by_label[_check_identifier(node["label"])].append({
+                "id": node["id"],
+                "properties": node.get("properties") or {},
+            })
+
+        written = 0
+        with self._session() as session:
+            for label, rows in rows_by_label.items():
+                query = f"""
+                UNWIND $rows AS row
+                MERGE (n:{CODE_ENTITY_LABEL} {{id: row.id}})
+                SET n:{label}, n += row.properties
+                RETURN count(n) AS written
+                """
+                for batch in _batches(rows, batch_size):
+                    written += session.run(query, rows=batch).single()["written"]
+        return written
+
+    def delete_edges(self, edges: list, batch_size: int = None) -> None:
+        """Deletes many edges by id; each edge is a dict with ``id`` and ``edge_type``."""
+        batch_size = batch_size or self.batch_size
+        ids_by_type = defaultdict(list)
+        for edge in edges:
+            ids_by_type[_check_identifier(edge["edge_type"])].append(edge["id"])
+        with self._session() as session:
+            for edge_type, ids in ids_by_type.items():
+                query = f"UNWIND $ids AS id MATCH ()-[r:{edge_type} {{id: id}}]->() DELETE r"
+                for batch in _batches(ids, batch_size):
+                    session.run(query, ids=batch)
+        if self.graph_cache is not None:
+            for edge in edges:
+                self.graph_cache.remove_edge(edge["id"])
+
+    def delete_nodes(self, node_ids: list, batch_size: int = None) -> None:
+        batch_size = batch_size or self.batch_size
+        with self._session() as session:
+            query = f"UNWIND $ids AS id MATCH (n:{CODE_ENTITY_LABEL} {{id: id}}) DETACH DELETE n"
+            for batch in _batches(node_ids, batch_size):
+                session.run(query, ids=batch)
+        if self.graph_cache is not None:
+            for node_id in node_ids:
+                self.graph_cache.remove_node(node_id)
+
+    def apply_graph_diff(self, diff: dict) -> None:
+        """Applies a graph diff produced by CodeParser.parse_directory_incremental; pass it as apply_diff."""
+        self.delete_edges(diff["remove_edges"])
+        self.delete_nodes(diff["remove_nodes"])
+        self.upsert_nodes(diff["upsert_nodes"])
+        self.create_edges(diff["add_edges"])
 
-    def delete_edge(self, edge_id: str) -> None:
-        with self.conn.get_session() as session:
-            session.run("MATCH ()-[r]->() WHERE r.id = $id DELETE r", id=edge_id)
+    def delete_edge(self, edge_id: str, edge_type: str = None) -> None:
+        with self._session() as session:
+            session.run(f"{_match_edges('r.id = $id', edge_type)} DELETE r", id=edge_id)
+        if self.graph_cache is not None:
+            self.graph_cache.remove_edge(edge_id)
 
-    def update_edge(self, edge_id: str, attributes: dict) -> dict:
-        with self.conn.get_session() as session:
+    def update_edge(self, edge_id: str, attributes: dict, edge_type: str = None) -> dict:
+        with self._session() as session:
             result = session.run(
-                "MATCH ()-[r]->() WHERE r.id = $id SET r += $attributes RETURN r",
+                f"{_match_edges('r.id = $id', edge_type)} SET r += $attributes RETURN r",
                 id=edge_id,
                 attributes=attributes
             )
-            return result.single()["r"]
+            record = result.single()
+            return record["r"] if record is not None else None
 
-    def get_edge(self, edge_id: str) -> dict:
-        with self.conn.get_session() as session:
+    def get_edge(self, edge_id: str, edge_type: str = None) -> dict:
+        with self._session() as session:
             result = session.run(
-                "MATCH ()-[r]->() WHERE r.id = $id RETURN r",
+                f"{_match_edges('r.id = $id', edge_type)} RETURN r",
                 id=edge_id
             )
-            return result.single()["r"]
+            record = result.single()
+            return record["r"] if record is not None else None
 
-    def find_edges(self, filters: dict) -> list:
-        with self.conn.get_session() as session:
-            query = "MATCH ()-[r]->() WHERE "
+    def find_edges(self, filters: dict, edge_type: str = None) -> list:
+        with self._session() as session:
             conditions = []
             for key, value in filters.items():
-                conditions.append(f"r.{key} = ${key}")
-            query += " AND ".join(conditions) + " RETURN r"
+                conditions.append(f"r.{_check_identifier(key)} = ${key}")
+            query = _match_edges(" AND ".join(conditions) or "true", edge_type) + " RETURN r"
             result = session.run(query, **filters)
-            return [record["r"] for record in result]
\ No newline at end of file
+            return [record["r"] for record in result]
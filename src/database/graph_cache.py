@@ -0,0 +1,386 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from .schema import CODE_ENTITY_LABEL
+
+DEFAULT_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+# Seconds after which a loaded cache is reloaded in the background, picking up writes
+# made by other processes.
+DEFAULT_TTL = float(os.getenv("GRAPH_CACHE_TTL", "300"))
+
+# Rough per-element costs (dict slots, array cells, CSR entries) used to enforce the budget.
+_NODE_OVERHEAD = 120
+_EDGE_OVERHEAD = 160
+# Edges added since the last CSR build are kept in a per-node overlay; the CSR is only
+# rebuilt once the overlay exceeds this many edges plus the given share of the graph.
+_DELTA_MIN_EDGES = int(os.getenv("GRAPH_CACHE_DELTA_MIN_EDGES", "4096"))
+_DELTA_RATIO = 0.1
+
+
+# Attributes holding the cached graph itself, swapped in as a whole when a load completes.
+_STATE_FIELDS = (
+    '_node_index', '_node_ids', '_type_index', '_type_names', '_src', '_dst', '_etype', '_alive',
+    '_edge_index', '_edge_ids', '_dead', '_bytes', '_indexed', '_csr_nodes', '_out_offsets', '_out_edges',
+    '_in_offsets', '_in_edges', '_delta_out', '_delta_in', '_delta_size',
+)
+
+
+class GraphCache:
+    """
+    In-memory copy of the code graph topology for hot read paths.
+
+    Node ids are interned to integers and edges are kept in parallel arrays. Out- and
+    in-adjacency are held in CSR arrays (offsets + targets). Removed edges are only
+    flagged dead, and added edges go to a small per-node overlay that reads consult
+    alongside the CSR, so a write never forces a rebuild; the CSR is rebuilt once the
+    overlay or the dead edges outgrow a share of the graph. EdgeManager keeps the cache
+    coherent through write-through hooks. If the graph grows past max_bytes the cache
+    disables itself and callers fall back to Neo4j.
+
+    Loading reads the graph into a separate copy without holding the lock and swaps it
+    in at the end, so readers keep using the previous copy (or Neo4j) meanwhile. Writes
+    made while a load is in flight are replayed onto the new copy before the swap.
+    Writes from other processes are only seen after the copy is older than ttl seconds
+    and has been reloaded.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = max_bytes > 0
+        self.ready = False
+        self.loaded_at = None
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._loading = False
+        # Write-through calls seen while a load is in flight, as (method name, args).
+        self._pending = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._node_index: Dict[str, int] = {}
+        self._node_ids: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self._type_names: List[str] = []
+        self._src = array('i')
+        self._dst = array('i')
+        self._etype = array('H')
+        self._alive = bytearray()
+        self._edge_index: Dict[str, int] = {}
+        self._edge_ids: List[Optional[str]] = []
+        self._dead = 0
+        self._bytes = 0
+        # False until the first CSR build; edges inserted before it need no overlay.
+        self._indexed = False
+        self._csr_nodes = 0
+        self._out_offsets = array('l')
+        self._out_edges = array('i')
+        self._in_offsets = array('l')
+        self._in_edges = array('i')
+        # node index -> positions of edges added since the CSR was built
+        self._delta_out: Dict[int, List[int]] = {}
+        self._delta_in: Dict[int, List[int]] = {}
+        self._delta_size = 0
+
+    def load(self, conn) -> None:
+        """Populates the cache from Neo4j in one streaming read, replacing any previous copy."""
+        with self._lock:
+            if not self.enabled or self._loading:
+                return
+            self._loading = True
+            self._pending = []
+        try:
+            fresh = GraphCache(self.max_bytes, self.ttl)
+            with conn.get_session() as session:
+                result = session.run(
+                    f"MATCH (a:{CODE_ENTITY_LABEL})-[r]->(b:{CODE_ENTITY_LABEL}) "
+                    "RETURN a.id AS source, b.id AS target, type(r) AS type, r.id AS id"
+                )
+                for record in result:
+                    fresh._insert_edge(record["id"], record["source"], record["target"], record["type"])
+                    if not fresh.enabled:
+                        break
+            if fresh.enabled:
+                # The copy is still private, so the CSR is built without blocking readers.
+                fresh._rebuild()
+            with self._lock:
+                if not fresh.enabled:
+                    # The copy already logged that it exceeded the budget.
+                    self._reset()
+                    self.enabled = False
+                    self.ready = False
+                    return
+                for name in _STATE_FIELDS:
+                    setattr(self, name, getattr(fresh, name))
+                pending, self._pending = self._pending, []
+                self._loading = False
+                self.ready = True
+                self.loaded_at = time.monotonic()
+                for method, args in pending:
+                    getattr(self, method)(*args)
+            self.logger.info(f"Graph cache loaded: {len(self._node_ids)} nodes, {len(self._src)} edges")
+        finally:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+
+    def load_async(self, conn) -> None:
+        """Starts a background load unless one is already running."""
+        with self._lock:
+            if not self.enabled or self._loading:
+                return
+        threading.Thread(target=self._load_logged, args=(conn,), name="graph-cache-load", daemon=True).start()
+
+    def _load_logged(self, conn) -> None:
+        try:
+            self.load(conn)
+        except Exception as e:
+            self.logger.error(f"Graph cache load failed: {e}")
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._reset()
+            self.ready = False
+            self.loaded_at = None
+
+    def _disable(self) -> None:
+        self.logger.warning(f"Graph cache exceeded its budget of {self.max_bytes} bytes; disabling it")
+        self._reset()
+        self.enabled = False
+        self.ready = False
+
+    # Write-through hooks
+
+    def _intern_node(self, node_id: str) -> int:
+        index = self._node_index.get(node_id)
+        if index is None:
+            index = len(self._node_ids)
+            self._node_index[node_id] = index
+            self._node_ids.append(node_id)
+            self._bytes += _NODE_OVERHEAD + len(node_id)
+        return index
+
+    def _intern_type(self, edge_type: str) -> int:
+        index = self._type_index.get(edge_type)
+        if index is None:
+            index = len(self._type_names)
+            self._type_index[edge_type] = index
+            self._type_names.append(edge_type)
+        return index
+
+    def _accepts_writes(self, method: str, *args) -> bool:
+        # Before the first load there is nothing to keep coherent; the load reads every edge.
+        if self._loading:
+            self._pending.append((method, args))
+        return self.enabled and (self.ready or self._loading)
+
+    def add_edge(self, edge_id: Optional[str], source_id: str, target_id: str, edge_type: str) -> None:
+        with self._lock:
+            if self._accepts_writes('add_edge', edge_id, source_id, target_id, edge_type):
+                self._insert_edge(edge_id, source_id, target_id, edge_type)
+
+    def _insert_edge(self, edge_id: Optional[str], source_id: str, target_id: str, edge_type: str) -> None:
+        with self._lock:
+            if not self.enabled:
+                return
+            if edge_id is not None and edge_id in self._edge_index:
+                return
+            position = len(self._src)
+            self._src.append(self._intern_node(source_id))
+            self._dst.append(self._intern_node(target_id))
+            self._etype.append(self._intern_type(edge_type))
+            self._alive.append(1)
+            self._edge_ids.append(edge_id)
+            if edge_id is not None:
+                self._edge_index[edge_id] = position
+                self._bytes += len(edge_id)
+            self._bytes += _EDGE_OVERHEAD
+            if self._indexed:
+                self._delta_out.setdefault(self._src[position], []).append(position)
+                self._delta_in.setdefault(self._dst[position], []).append(position)
+                self._delta_size += 1
+            if self._bytes > self.max_bytes:
+                self._disable()
+
+    def remove_edge(self, edge_id: str) -> None:
+        with self._lock:
+            if not self._accepts_writes('remove_edge', edge_id):
+                return
+            position = self._edge_index.pop(edge_id, None)
+            if position is not None and self._alive[position]:
+                self._alive[position] = 0
+                self._dead += 1
+
+    def remove_node(self, node_id: str) -> None:
+        with self._lock:
+            if not self._accepts_writes('remove_node', node_id):
+                return
+            index = self._node_index.get(node_id)
+            if index is None:
+                return
+            self._ensure_csr()
+            for _, position in list(self._adjacent(index, 'both', None)):
+                if self._alive[position]:
+                    self._alive[position] = 0
+                    self._dead += 1
+                    if self._edge_ids[position] is not None:
+                        self._edge_index.pop(self._edge_ids[position], None)
+
+    # CSR maintenance
+
+    def _compact(self) -> None:
+        keep = [position for position in range(len(self._src)) if self._alive[position]]
+        self._src = array('i', (self._src[p] for p in keep))
+        self._dst = array('i', (self._dst[p] for p in keep))
+        self._etype = array('H', (self._etype[p] for p in keep))
+        self._edge_ids = [self._edge_ids[p] for p in keep]
+        self._alive = bytearray(b'\x01' * len(keep))
+        self._edge_index = {eid: position for position, eid in enumerate(self._edge_ids) if eid is not None}
+        self._dead = 0
+
+    def _build_csr(self, keys: array) -> tuple:
+        node_count = len(self._node_ids)
+        offsets = array('l', bytes(array('l').itemsize * (node_count + 1)))
+        for key in keys:
+            offsets[key + 1] += 1
+        for index in range(node_count):
+            offsets[index + 1] += offsets[index]
+        cursor = array('l', offsets)
+        edges = array('i', bytes(array('i').itemsize * len(keys)))
+        for position, key in enumerate(keys):
+            edges[cursor[key]] = position
+            cursor[key] += 1
+        return offsets, edges
+
+    def _rebuild(self) -> None:
+        if self._dead and self._dead * 2 > len(self._src):
+            self._compact()
+        self._out_offsets, self._out_edges = self._build_csr(self._src)
+        self._in_offsets, self._in_edges = self._build_csr(self._dst)
+        self._csr_nodes = len(self._node_ids)
+        self._delta_out = {}
+        self._delta_in = {}
+        self._delta_size = 0
+        self._indexed = True
+
+    def _ensure_csr(self) -> None:
+        # Reads go through the overlay; a rebuild is only worth it once the overlay or the
+        # dead edges make up a noticeable share of the graph.
+        if not self._indexed or self._delta_size > _DELTA_MIN_EDGES + len(self._src) * _DELTA_RATIO \
+                or (self._dead > _DELTA_MIN_EDGES and self._dead * 2 > len(self._src)):
+            self._rebuild()
+
+    def _positions(self, index: int, offsets: array, edges: array, delta: Dict[int, List[int]]):
+        if index < self._csr_nodes:
+            yield from edges[offsets[index]:offsets[index + 1]]
+        yield from delta.get(index, ())
+
+    def _adjacent(self, index: int, direction: str, type_filter: Optional[set]):
+        """Yields (neighbour index, edge position) pairs for live edges."""
+        if direction in ('out', 'both'):
+            for position in self._positions(index, self._out_offsets, self._out_edges, self._delta_out):
+                if self._alive[position] and (type_filter is None or self._etype[position] in type_filter):
+                    yield self._dst[position], position
+        if direction in ('in', 'both'):
+            for position in self._positions(index, self._in_offsets, self._in_edges, self._delta_in):
+                if self._alive[position] and (type_filter is None or self._etype[position] in type_filter):
+                    yield self._src[position], position
+
+    def _type_filter(self, edge_types: Optional[list]) -> Optional[set]:
+        if not edge_types:
+            return None
+        return {self._type_index[t] for t in edge_types if t in self._type_index}
+
+    # Queries
+
+    def neighbours(self, node_id: str, direction: str = 'both', edge_types: list = None) -> List[str]:
+        with self._lock:
+            index = self._node_index.get(node_id)
+            if index is None:
+                return []
+            self._ensure_csr()
+            seen = set()
+            for neighbour, _ in self._adjacent(index, direction, self._type_filter(edge_types)):
+                seen.add(neighbour)
+            return [self._node_ids[neighbour] for neighbour in seen]
+
+    def neighbour_edges(self, node_id: str, direction: str = 'both', edge_types: list = None) -> List[tuple]:
+        """Distinct (neighbour id, relationship type) pairs of node_id."""
+        with self._lock:
+            index = self._node_index.get(node_id)
+            if index is None:
+                return []
+            self._ensure_csr()
+            seen = set()
+            for neighbour, position in self._adjacent(index, direction, self._type_filter(edge_types)):
+                seen.add((neighbour, self._etype[position]))
+            return [(self._node_ids[neighbour], self._type_names[etype]) for neighbour, etype in seen]
+
+    def get_subgraph(self, node_ids: list) -> dict:
+        """Returns the ids of the given nodes and of the edges among them that exist in the graph."""
+        with self._lock:
+            self._ensure_csr()
+            wanted = {self._node_index[nid] for nid in node_ids if nid in self._node_index}
+            nodes = set()
+            edges = set()
+            for index in wanted:
+                for neighbour, position in self._adjacent(index, 'out', None):
+                    if neighbour in wanted:
+                        nodes.add(index)
+                        nodes.add(neighbour)
+                        edges.add(self._edge_ids[position])
+            return {
+                "nodes": [self._node_ids[index] for index in nodes],
+                "edges": [eid for eid in edges if eid is not None],
+            }
+
+    def shortest_path(self, source_node_id: str, target_node_id: str, max_depth: int = None) -> Optional[List[str]]:
+        """Breadth-first search over undirected edges; returns node ids from source to target."""
+        with self._lock:
+            source = self._node_index.get(source_node_id)
+            target = self._node_index.get(target_node_id)
+            if source is None or target is None:
+                return None
+            self._ensure_csr()
+            parents = {source: -1}
+            frontier = deque([(source, 0)])
+            while frontier:
+                index, depth = frontier.popleft()
+                if index == target:
+                    path = []
+                    while index != -1:
+                        path.append(self._node_ids[index])
+                        index = parents[index]
+                    return path[::-1]
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for neighbour, _ in self._adjacent(index, 'both', None):
+                    if neighbour not in parents:
+                        parents[neighbour] = index
+                        frontier.append((neighbour, depth + 1))
+            return None
+
+    def estimated_bytes(self) -> int:
+        return self._bytes
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_graph_cache() -> GraphCache:
+    """Process-wide cache instance, so EdgeManager writes and QueryEngine reads see the same graph."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = GraphCache()
+    return _shared_cache
@@ -0,0 +1,168 @@
+import codecs
+import logging
+import os
+import threading
+import time
+from typing import List
+
+from .query_engine import QueryEngine, register_statement
+
+DEFAULT_CHUNK_BYTES = int(os.getenv("LOG_CHUNK_BYTES", str(64 * 1024)))
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.25"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS execution_log_chunks (
+    execution_id BIGINT NOT NULL,
+    seq INTEGER NOT NULL,
+    stream TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (execution_id, seq)
+)
+"""
+
+register_statement(
+    "append_log_chunk",
+    "INSERT INTO execution_log_chunks (execution_id, seq, stream, data) VALUES ($1, $2, $3, $4)"
+)
+register_statement(
+    "next_log_seq",
+    "SELECT COALESCE(MAX(seq) + 1, 0) FROM execution_log_chunks WHERE execution_id = $1"
+)
+register_statement(
+    "read_log_chunks",
+    "SELECT seq, stream, data FROM execution_log_chunks "
+    "WHERE execution_id = $1 AND seq > $2 ORDER BY seq LIMIT $3"
+)
+register_statement(
+    "tail_log_chunks",
+    "SELECT seq, stream, data FROM ("
+    "SELECT seq, stream, data FROM execution_log_chunks WHERE execution_id = $1 ORDER BY seq DESC LIMIT $2"
+    ") AS tail ORDER BY seq"
+)
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def ensure_log_schema(query_engine: QueryEngine) -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            query_engine.execute_query(_SCHEMA)
+            _schema_ready = True
+
+
+class ExecutionLogWriter:
+    """
+    Appends one execution's output to the log store in numbered chunks.
+
+    Output is buffered per stream and written once chunk_bytes are pending or
+    flush_interval seconds have passed, so a chatty process does not cost a round
+    trip per line and a quiet one still shows up promptly.
+    """
+
+    def __init__(self, store, execution_id, next_seq: int):
+        self.store = store
+        self.execution_id = execution_id
+        self._seq = next_seq
+        self._pending = []
+        self._pending_bytes = 0
+        self._decoders = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def write(self, stream: str, data) -> None:
+        if isinstance(data, bytes):
+            decoder = self._decoders.get(stream)
+            if decoder is None:
+                decoder = self._decoders[stream] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            data = decoder.decode(data)
+        if not data:
+            return
+        with self._lock:
+            if self._pending and self._pending[-1][0] == stream:
+                self._pending[-1][1].append(data)
+            else:
+                self._pending.append((stream, [data]))
+            self._pending_bytes += len(data)
+            due = (self._pending_bytes >= self.store.chunk_bytes
+                   or time.monotonic() - self._last_flush >= self.store.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending, self._pending_bytes = self._pending, [], 0
+            self._last_flush = time.monotonic()
+            rows = []
+            for stream, parts in pending:
+                text = ''.join(parts)
+                for start in range(0, len(text), self.store.chunk_bytes):
+                    rows.append((self.execution_id, self._seq, stream, text[start:start + self.store.chunk_bytes]))
+                    self._seq += 1
+            if rows:
+                self.store.query_engine.execute_prepared_batch("append_log_chunk", rows)
+
+    def close(self) -> None:
+        for stream, decoder in self._decoders.items():
+            self.write(stream, decoder.decode(b'', final=True))
+        self.flush()
+        self.store.release(self)
+
+
+class ExecutionLogStore:
+    """
+    Append-only execution logs kept as sequence-numbered chunks in Postgres.
+
+    Readers page forward with read(after_seq) or fetch the last chunks with tail(),
+    so following a running execution only transfers chunks the client has not seen.
+    A background thread flushes open writers every flush_interval seconds.
+    """
+
+    def __init__(self, query_engine: QueryEngine = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.query_engine = query_engine or QueryEngine()
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self._writers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def writer(self, execution_id) -> ExecutionLogWriter:
+        ensure_log_schema(self.query_engine)
+        row = self.query_engine.execute_prepared("next_log_seq", (execution_id,), fetch_one=True)
+        writer = ExecutionLogWriter(self, execution_id, row[0])
+        with self._lock:
+            self._writers.add(writer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="execution-log-flusher", daemon=True)
+                self._thread.start()
+        return writer
+
+    def release(self, writer: ExecutionLogWriter) -> None:
+        with self._lock:
+            self._writers.discard(writer)
+
+    def read(self, execution_id, after_seq: int = -1, limit: int = 500) -> List[tuple]:
+        """Returns up to limit (seq, stream, data) chunks following after_seq."""
+        ensure_log_schema(self.query_engine)
+        return self.query_engine.execute_prepared("read_log_chunks", (execution_id, after_seq, limit))
+
+    def tail(self, execution_id, limit: int = 50) -> List[tuple]:
+        ensure_log_schema(self.query_engine)
+        return self.query_engine.execute_prepared("tail_log_chunks", (execution_id, limit))
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                writers = list(self._writers)
+            for writer in writers:
+                try:
+                    writer.flush()
+                except Exception as e:
+                    self.logger.error(f"Failed to flush logs for execution {writer.execution_id}: {e}")
@@ -1,38 +1,66 @@
 import logging
-from .query_engine import QueryEngine
+from .query_engine import QueryEngine, register_statement
+from .status_buffer import get_status_buffer
+
+register_statement(
+    "create_execution",
+    "INSERT INTO executions (project_id, status, started_at) VALUES ($1, $2, NOW()) RETURNING id"
+)
+register_statement("get_execution_status", "SELECT status FROM executions WHERE id = $1")
+register_statement("get_execution_statuses", "SELECT id, status FROM executions WHERE id = ANY($1)")
+register_statement("get_execution_logs", "SELECT logs FROM executions WHERE id = $1")
+register_statement(
+    "get_queued_executions",
+    "SELECT id FROM executions WHERE status = 'Queued' AND started_at < NOW() - make_interval(secs => $1)"
+)
+
 
 class NodeManager:
-    def __init__(self):
-        self.query_engine = QueryEngine()
+    def __init__(self, query_engine: QueryEngine = None, status_buffer=None):
+        self.query_engine = query_engine or QueryEngine()
+        self.status_buffer = status_buffer or get_status_buffer(self.query_engine)
         self.logger = logging.getLogger(__name__)
 
-    def create_execution(self, project_id):
+    def create_execution(self, project_id, status='Running'):
         self.logger.info(f"Creating execution record for project_id: {project_id}")
-        query = """
-        INSERT INTO executions (project_id, status, started_at)
-        VALUES (%s, %s, NOW())
-        RETURNING id
-        """
-        execution_id = self.query_engine.execute_query(query, (project_id, 'Running'))
+        row = self.query_engine.execute_prepared("create_execution", (project_id, status), fetch_one=True)
+        execution_id = row[0]
         self.logger.info(f"Execution record created with id: {execution_id}")
         return execution_id
 
     def get_execution_status(self, execution_id):
-        self.logger.info(f"Fetching status for execution_id: {execution_id}")
-        query = "SELECT status FROM executions WHERE id = %s"
-        status = self.query_engine.execute_query(query, (execution_id,), fetch_one=True)
-        self.logger.info(f"Status for execution_id {execution_id}: {status}")
+        # Pending buffered transitions are newer than what Postgres holds.
+        buffered = self.status_buffer.get(execution_id)
+        if buffered is not None:
+            return (buffered,)
+        status = self.query_engine.execute_prepared("get_execution_status", (execution_id,), fetch_one=True)
+        self.logger.debug(f"Status for execution_id {execution_id}: {status}")
         return status
 
+    def get_execution_statuses(self, execution_ids) -> dict:
+        """Returns {execution_id: status} for many executions in one round trip."""
+        execution_ids = list(execution_ids)
+        statuses = self.status_buffer.get_many(execution_ids)
+        missing = [eid for eid in execution_ids if eid not in statuses]
+        if missing:
+            rows = self.query_engine.execute_prepared("get_execution_statuses", (missing,))
+            statuses.update({execution_id: status for execution_id, status in rows})
+        return statuses
+
+    def get_queued_executions(self, older_than: float) -> list:
+        """Ids of executions that have been Queued for more than older_than seconds."""
+        self.flush_execution_statuses()
+        return [row[0] for row in self.query_engine.execute_prepared("get_queued_executions", (older_than,))]
+
     def update_execution_status(self, execution_id, status):
-        self.logger.info(f"Updating status for execution_id: {execution_id} to {status}")
-        query = "UPDATE executions SET status = %s, ended_at = NOW() WHERE id = %s"
-        self.query_engine.execute_query(query, (status, execution_id))
-        self.logger.info(f"Execution_id {execution_id} updated to status: {status}")
+        self.logger.debug(f"Recording status {status} for execution_id: {execution_id}")
+        self.status_buffer.record(execution_id, status)
+
+    def flush_execution_statuses(self):
+        self.status_buffer.flush()
 
     def get_execution_logs(self, execution_id):
         self.logger.info(f"Retrieving logs for execution_id: {execution_id}")
-        query = "SELECT logs FROM executions WHERE id = %s"
-        logs = self.query_engine.execute_query(query, (execution_id,), fetch_one=True)
+        logs = self.query_engine.execute_prepared("get_execution_logs", (execution_id,), fetch_one=True)
         self.logger.info(f"Logs retrieved for execution_id {execution_id}")
-        return logs
\ No newline at end of file
+        return logs
@@ -1,47 +1,139 @@
-import psycopg2
-from psycopg2 import sql
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extras import execute_batch
+from .connection_pool import get_pool
+from .database import Neo4jConnection
+from .schema import CODE_ENTITY_LABEL
+
+# Fixed statements prepared server-side once per pooled connection; they use $n placeholders.
+PREPARED_STATEMENTS = {}
+
+
+def register_statement(name: str, query: str) -> None:
+    PREPARED_STATEMENTS[name] = query
+
+
+def _fetch(cursor, fetch_one: bool):
+    if cursor.description is None:
+        return None
+    return cursor.fetchone() if fetch_one else cursor.fetchall()
+
 
 class QueryEngine:
-    def __init__(self):
-        self.connection = psycopg2.connect(
-            dbname='your_db',
-            user='your_user',
-            password='your_password',
-            host='localhost',
-            port='5432'
-        )
+    def __init__(self, graph_cache=None, pool=None):
+        self.pool = pool or get_pool()
+        self.conn = Neo4jConnection()
+        # Optional GraphCache answering graph reads locally once it has been loaded.
+        self.graph_cache = graph_cache
         self.logger = logging.getLogger(__name__)
 
     def execute_query(self, query, params=None, fetch_one=False):
-        self.logger.debug(f"Executing query: {query} with params: {params}")
-        with self.connection.cursor() as cursor:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Executing query: {query.split(None, 1)[0]} ({len(params or ())} params)")
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             cursor.execute(query, params)
-            if fetch_one:
-                result = cursor.fetchone()
-            else:
-                result = cursor.fetchall()
-            self.connection.commit()
-            return result
+            return _fetch(cursor, fetch_one)
+
+    def _ensure_prepared(self, connection, cursor, name) -> None:
+        if name not in connection.prepared:
+            cursor.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+            connection.prepared.add(name)
+
+    def execute_prepared(self, name, params=(), fetch_one=False):
+        """Runs a statement registered with register_statement, preparing it on first use per connection."""
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            self._ensure_prepared(connection, cursor, name)
+            placeholders = ", ".join(["%s"] * len(params))
+            cursor.execute(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", params)
+            return _fetch(cursor, fetch_one)
+
+    def execute_prepared_batch(self, name, rows, page_size=500):
+        """Runs a registered statement for many parameter rows, sending page_size executions per round trip."""
+        if not rows:
+            return
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            self._ensure_prepared(connection, cursor, name)
+            placeholders = ", ".join(["%s"] * len(rows[0]))
+            execute_batch(cursor, f"EXECUTE {name} ({placeholders})", rows, page_size=page_size)
+
+    def _cached_graph(self):
+        cache = self.graph_cache
+        if cache is None or not cache.enabled:
+            return None
+        if not cache.ready:
+            # Reads go to Neo4j until the background load has finished.
+            cache.load_async(self.conn)
+            return None
+        if cache.is_stale():
+            # Keeps serving the current copy while a fresh one is loaded.
+            cache.load_async(self.conn)
+        return cache
 
     def find_shortest_path(self, source_node_id: str, target_node_id: str) -> list:
+        """Node ids along a shortest undirected path from source to target, or None when they are not connected."""
+        cache = self._cached_graph()
+        if cache is not None:
+            return cache.shortest_path(source_node_id, target_node_id)
         with self.conn.get_session() as session:
             result = session.run(
-                """
-                MATCH (start {id: $source_id}), (end {id: $target_id}),
+                f"""
+                MATCH (start:{CODE_ENTITY_LABEL} {{id: $source_id}}), (end:{CODE_ENTITY_LABEL} {{id: $target_id}}),
                 p = shortestPath((start)-[*]-(end))
                 RETURN p
                 """,
                 source_id=source_node_id,
                 target_id=target_node_id
             )
-            return result.single()["p"] if result.single() else None
+            record = result.single()
+            return [node["id"] for node in record["p"].nodes] if record else None
+
+    def get_neighbours(self, node_id: str, direction: str = 'both', edge_types: list = None) -> list:
+        cache = self._cached_graph()
+        if cache is not None:
+            return cache.neighbours(node_id, direction, edge_types)
+        pattern = {'out': '-[r]->', 'in': '<-[r]-', 'both': '-[r]-'}[direction]
+        with self.conn.get_session() as session:
+            result = session.run(
+                f"""
+                MATCH (n:{CODE_ENTITY_LABEL} {{id: $id}}){pattern}(m:{CODE_ENTITY_LABEL})
+                WHERE $types IS NULL OR type(r) IN $types
+                RETURN DISTINCT m.id AS id
+                """,
+                id=node_id,
+                types=edge_types or None
+            )
+            return [record["id"] for record in result]
+
+    def get_neighbour_edges(self, node_ids: list, edge_types: list = None) -> dict:
+        """Maps each node id to its distinct (neighbour id, relationship type) pairs, in one round trip."""
+        cache = self._cached_graph()
+        if cache is not None:
+            return {node_id: cache.neighbour_edges(node_id, 'both', edge_types) for node_id in node_ids}
+        neighbours = {node_id: set() for node_id in node_ids}
+        with self.conn.get_session() as session:
+            result = session.run(
+                f"""
+                MATCH (n:{CODE_ENTITY_LABEL})-[r]-(m:{CODE_ENTITY_LABEL})
+                WHERE n.id IN $ids AND ($types IS NULL OR type(r) IN $types)
+                RETURN n.id AS id, m.id AS neighbour, type(r) AS type
+                """,
+                ids=node_ids,
+                types=edge_types or None
+            )
+            for record in result:
+                neighbours[record["id"]].add((record["neighbour"], record["type"]))
+        return {node_id: list(pairs) for node_id, pairs in neighbours.items()}
 
     def get_subgraph(self, node_ids: list) -> dict:
+        """Ids of the given nodes that have edges among themselves, and the id properties of those edges."""
+        cache = self._cached_graph()
+        if cache is not None:
+            return cache.get_subgraph(node_ids)
         with self.conn.get_session() as session:
             result = session.run(
-                """
-                MATCH (n)-[r]->(m)
+                f"""
+                MATCH (n:{CODE_ENTITY_LABEL})-[r]->(m:{CODE_ENTITY_LABEL})
                 WHERE n.id IN $ids AND m.id IN $ids
                 RETURN n, r, m
                 """,
@@ -54,6 +146,69 @@ class QueryEngine:
                 nodes.append(record["m"])
                 edges.append(record["r"])
             # Remove duplicates
-            nodes = list({node.id for node in nodes})
-            edges = list({edge.id for edge in edges})
-            return {"nodes": nodes, "edges": edges}
\ No newline at end of file
+            nodes = list({node["id"] for node in nodes})
+            edges = list({edge.get("id") for edge in edges} - {None})
+            return {"nodes": nodes, "edges": edges}
+
+
+    def find_entities(self, name: str, limit: int = 20) -> list:
+        """Ids of entities named name, belonging to module name, or nested under it, via the lookup indexes."""
+        with self.conn.get_session() as session:
+            result = session.run(
+                f"""
+                CALL {{
+                    MATCH (n:{CODE_ENTITY_LABEL} {{id: $module_id}}) RETURN n
+                    UNION MATCH (n:{CODE_ENTITY_LABEL} {{module: $name}}) RETURN n
+                    UNION MATCH (n:{CODE_ENTITY_LABEL} {{name: $name}}) RETURN n
+                    UNION MATCH (n:{CODE_ENTITY_LABEL}) WHERE n.qualified_name STARTS WITH $prefix RETURN n
+                }}
+                RETURN n.id AS id LIMIT $limit
+                """,
+                module_id=f"module:{name}",
+                name=name,
+                prefix=f"{name}.",
+                limit=limit
+            )
+            return [record["id"] for record in result]
+
+    def get_entities(self, node_ids: list) -> list:
+        """Label and properties of each given entity, in one round trip."""
+        with self.conn.get_session() as session:
+            result = session.run(
+                f"""
+                MATCH (n:{CODE_ENTITY_LABEL}) WHERE n.id IN $ids
+                RETURN n.id AS id, [l IN labels(n) WHERE l <> '{CODE_ENTITY_LABEL}'][0] AS label,
+                       properties(n) AS properties
+                """,
+                ids=node_ids
+            )
+            return [{"id": record["id"], "label": record["label"], "properties": record["properties"]}
+                    for record in result]
+
+
+class AsyncQueryEngine:
+    """
+    asyncio front end for QueryEngine. Statements run on a thread pool sized to the
+    connection pool, so coroutines on the event loop never block on Postgres.
+    """
+
+    def __init__(self, query_engine: QueryEngine = None):
+        self.query_engine = query_engine or QueryEngine()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.query_engine.pool.max_size,
+            thread_name_prefix="postgres"
+        )
+
+    async def run(self, func, *args):
+        """Runs a blocking call that draws on this engine's pool, e.g. a NodeManager or log store read."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def execute_query(self, query, params=None, fetch_one=False):
+        return await self.run(self.query_engine.execute_query, query, params, fetch_one)
+
+    async def execute_prepared(self, name, params=(), fetch_one=False):
+        return await self.run(self.query_engine.execute_prepared, name, params, fetch_one)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,46 @@
+import threading
+
+# Every code entity also carries the shared CodeEntity label, so lookups that do
+# not know the concrete label can still go through a single unique index on id.
+CODE_ENTITY_LABEL = "CodeEntity"
+CODE_ENTITY_LABELS = ("Module", "Class", "Function", "File")
+RELATIONSHIP_TYPES = ("CONTAINS", "IMPORTS", "CALLS", "INHERITS", "IMPLEMENTS")
+# Properties used to find entities by name, e.g. when assembling prompt context.
+CODE_ENTITY_LOOKUP_PROPERTIES = ("name", "module", "qualified_name")
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def schema_statements() -> list:
+    statements = []
+    for label in (CODE_ENTITY_LABEL,) + CODE_ENTITY_LABELS:
+        statements.append(
+            f"CREATE CONSTRAINT {label.lower()}_id_unique IF NOT EXISTS "
+            f"FOR (n:{label}) REQUIRE n.id IS UNIQUE"
+        )
+    for prop in CODE_ENTITY_LOOKUP_PROPERTIES:
+        statements.append(
+            f"CREATE INDEX {CODE_ENTITY_LABEL.lower()}_{prop}_index IF NOT EXISTS "
+            f"FOR (n:{CODE_ENTITY_LABEL}) ON (n.{prop})"
+        )
+    for rel_type in RELATIONSHIP_TYPES:
+        statements.append(
+            f"CREATE INDEX {rel_type.lower()}_id_index IF NOT EXISTS "
+            f"FOR ()-[r:{rel_type}]-() ON (r.id)"
+        )
+    return statements
+
+
+def ensure_schema(conn) -> None:
+    """Creates the uniqueness constraints and relationship indexes once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with conn.get_session() as session:
+            for statement in schema_statements():
+                session.run(statement)
+        _schema_ready = True
@@ -0,0 +1,126 @@
+import atexit
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from .query_engine import QueryEngine, register_statement
+
+TERMINAL_STATUSES = ('Completed', 'Failed', 'Terminated')
+_FINISHED_HISTORY = 10000
+
+# The first terminal state wins: rows that already reached one are never overwritten.
+register_statement(
+    "flush_execution_status",
+    "UPDATE executions SET status = $1, ended_at = COALESCE($2, ended_at) "
+    "WHERE id = $3 AND status NOT IN ('Completed', 'Failed', 'Terminated')"
+)
+
+
+class ExecutionStatusBuffer:
+    """
+    Write-behind buffer for execution status transitions.
+
+    Transitions are merged per execution id in memory and flushed in one batched
+    round trip when max_pending executions are waiting or every flush_interval
+    seconds, whichever comes first. Once an execution reaches a terminal state,
+    later transitions for it are dropped, both here and by the flush statement.
+    """
+
+    def __init__(self, query_engine, flush_interval: float = None, max_pending: int = None):
+        self.query_engine = query_engine
+        self.flush_interval = flush_interval or float(os.getenv("STATUS_FLUSH_INTERVAL", "0.5"))
+        self.max_pending = max_pending or int(os.getenv("STATUS_FLUSH_MAX_PENDING", "500"))
+        self.logger = logging.getLogger(__name__)
+        self._pending = {}
+        # The batch being written; still served to readers until its transaction commits.
+        self._flushing = {}
+        # Recently flushed terminal executions, so late non-terminal transitions are dropped too.
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="execution-status-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def record(self, execution_id, status: str) -> None:
+        with self._lock:
+            self._start()
+            current = self._pending.get(execution_id) or self._flushing.get(execution_id)
+            if execution_id in self._finished or (current is not None and current[0] in TERMINAL_STATUSES):
+                return
+            ended_at = datetime.now(timezone.utc) if status in TERMINAL_STATUSES else None
+            self._pending[execution_id] = (status, ended_at)
+            if len(self._pending) >= self.max_pending:
+                self._wakeup.set()
+
+    def get(self, execution_id) -> Optional[str]:
+        """Returns the buffered status for an execution whose flush has not committed yet."""
+        with self._lock:
+            entry = self._pending.get(execution_id) or self._flushing.get(execution_id)
+        return entry[0] if entry else None
+
+    def get_many(self, execution_ids) -> dict:
+        with self._lock:
+            statuses = {}
+            for eid in execution_ids:
+                entry = self._pending.get(eid) or self._flushing.get(eid)
+                if entry is not None:
+                    statuses[eid] = entry[0]
+            return statuses
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            if not batch:
+                return
+            rows = [(status, ended_at, execution_id) for execution_id, (status, ended_at) in batch.items()]
+            try:
+                self.query_engine.execute_prepared_batch("flush_execution_status", rows)
+            except Exception as e:
+                self.logger.error(f"Failed to flush {len(rows)} execution status updates: {e}")
+                with self._lock:
+                    self._flushing = {}
+                    # Newer transitions recorded meanwhile win, unless this one was terminal.
+                    for execution_id, entry in batch.items():
+                        newer = self._pending.get(execution_id)
+                        if newer is None or (entry[0] in TERMINAL_STATUSES and newer[0] not in TERMINAL_STATUSES):
+                            self._pending[execution_id] = entry
+                return
+            with self._lock:
+                self._flushing = {}
+                for execution_id, (status, _) in batch.items():
+                    if status in TERMINAL_STATUSES:
+                        self._finished[execution_id] = None
+                while len(self._finished) > _FINISHED_HISTORY:
+                    self._finished.popitem(last=False)
+            self.logger.debug(f"Flushed {len(rows)} execution status updates")
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+_shared_buffer = None
+_shared_lock = threading.Lock()
+
+
+def get_status_buffer(query_engine=None) -> ExecutionStatusBuffer:
+    """Process-wide buffer, so every NodeManager in a process reads its own pending writes."""
+    global _shared_buffer
+    if _shared_buffer is None:
+        with _shared_lock:
+            if _shared_buffer is None:
+                _shared_buffer = ExecutionStatusBuffer(query_engine or QueryEngine())
+    return _shared_buffer
@@ -0,0 +1,238 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+
+import docker
+
+DEFAULT_IMAGE = 'python:3.9-slim'
+
+# Resource limits applied when pooled containers are started, by profile name.
+RESOURCE_PROFILES = {
+    'small': {'mem_limit': '256m', 'nano_cpus': 500_000_000, 'pids_limit': 128},
+    'default': {'mem_limit': '512m', 'nano_cpus': 1_000_000_000, 'pids_limit': 256},
+    'large': {'mem_limit': '2g', 'nano_cpus': 2_000_000_000, 'pids_limit': 512},
+}
+
+# Pooled containers run with a read-only root filesystem; these tmpfs mounts (and Docker's
+# own /dev/shm) are the only places a tenant can write, and all of them are wiped on reset.
+WRITABLE_PATHS = ('/workspace', '/tmp', '/var/tmp', '/root', '/home', '/run')
+_TMPFS_OPTIONS = f"rw,exec,size={os.getenv('CONTAINER_TMPFS_SIZE', '512m')}"
+
+# Kills every process except PID 1 (the idle `sleep infinity`), wipes every writable path and
+# fails if anything is left behind, so a container is never handed on with tenant state.
+_WIPED = ' '.join(f'{path}/* {path}/.[!.]* {path}/..?*' for path in WRITABLE_PATHS + ('/dev/shm',))
+_RESET_COMMAND = ['sh', '-c', f'kill -9 -1 2>/dev/null; rm -rf {_WIPED} 2>/dev/null; '
+                              f'for f in {_WIPED}; do [ -e "$f" ] && exit 1; done; exit 0']
+
+POOL_LABEL = 'gcbms.pool'
+# host:pid of the process whose pool owns a container, so orphans can be found after it dies.
+OWNER_LABEL = 'gcbms.pool.owner'
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ContainerPool:
+    """
+    Pre-warmed sandbox containers keyed by (image, resource profile).
+
+    lease() hands out an idle container, or starts one cold when none is idle. release()
+    resets the container for the next tenant and keeps it idle while fewer than max_idle
+    are idle for its key; otherwise it is removed. A maintenance thread tops every key
+    up to min_idle and evicts idle containers that fail their health check. Keys for
+    images other than DEFAULT_IMAGE that have not been leased for key_ttl seconds are
+    drained, so per-project images do not hold idle containers indefinitely.
+
+    Containers are labelled with the host and pid of the owning process. Idle containers
+    only live in that process's memory, so the maintenance thread also removes pooled
+    containers on this host whose owner is no longer running, and the pool is closed
+    when the process exits.
+    """
+
+    def __init__(self, client, min_idle: int = None, max_idle: int = None, maintenance_interval: float = None,
+                 key_ttl: float = None, container_options=None):
+        self.client = client
+        # Callable returning extra containers.run options, e.g. the sandbox network and AppArmor profile.
+        self.container_options = container_options
+        self.min_idle = min_idle if min_idle is not None else int(os.getenv("CONTAINER_POOL_MIN_IDLE", "2"))
+        self.max_idle = max_idle if max_idle is not None else int(os.getenv("CONTAINER_POOL_MAX_IDLE", "8"))
+        self.maintenance_interval = maintenance_interval or float(os.getenv("CONTAINER_POOL_INTERVAL", "5"))
+        self.key_ttl = key_ttl or float(os.getenv("CONTAINER_POOL_KEY_TTL", "600"))
+        self.orphan_sweep_interval = float(os.getenv("CONTAINER_POOL_ORPHAN_SWEEP_INTERVAL", "60"))
+        self.logger = logging.getLogger(__name__)
+        self._idle = defaultdict(deque)
+        self._leased = {}
+        self._last_lease = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _start_maintenance(self) -> None:
+        # Started lazily so it runs in the process that uses the pool (e.g. after a Celery fork).
+        if self._thread is None:
+            atexit.register(self.close)
+            self._thread = threading.Thread(target=self._maintain, name="container-pool", daemon=True)
+            self._thread.start()
+
+    def _spawn(self, key):
+        image, profile = key
+        options = self.container_options() if self.container_options else {}
+        return self.client.containers.run(
+            image=image,
+            command='sleep infinity',
+            detach=True,
+            working_dir='/workspace',
+            ports={'8000/tcp': None},
+            labels={POOL_LABEL: 'true', OWNER_LABEL: _owner(), 'gcbms.profile': profile},
+            read_only=True,
+            tmpfs={path: _TMPFS_OPTIONS for path in WRITABLE_PATHS},
+            **RESOURCE_PROFILES[profile],
+            **options
+        )
+
+    def _healthy(self, container) -> bool:
+        try:
+            container.reload()
+            return container.status == 'running'
+        except docker.errors.APIError:
+            return False
+
+    def lease(self, image: str = DEFAULT_IMAGE, profile: str = 'default'):
+        if profile not in RESOURCE_PROFILES:
+            raise ValueError(f"Unknown resource profile: {profile}")
+        key = (image, profile)
+        with self._lock:
+            self._start_maintenance()
+            self._last_lease[key] = time.monotonic()
+            idle = self._idle[key]
+        while True:
+            with self._lock:
+                container = idle.popleft() if idle else None
+            if container is None:
+                self.logger.info(f"No idle container for {key}; starting one cold")
+                container = self._spawn(key)
+                break
+            if self._healthy(container):
+                break
+            self._remove(container)
+        with self._lock:
+            self._leased[container.id] = key
+        return container
+
+    def release(self, container) -> None:
+        with self._lock:
+            key = self._leased.pop(container.id, None)
+        if key is None:
+            self._remove(container)
+            return
+        try:
+            exit_code, _ = container.exec_run(_RESET_COMMAND)
+            reset = exit_code == 0
+        except docker.errors.APIError as e:
+            self.logger.warning(f"Failed to reset container {container.id}: {e}")
+            reset = False
+        with self._lock:
+            keep = reset and len(self._idle[key]) < self.max_idle
+            if keep:
+                self._idle[key].append(container)
+        if not keep:
+            self._remove(container)
+
+    def discard(self, container) -> None:
+        """Removes a leased container instead of returning it, e.g. after a forced termination."""
+        with self._lock:
+            self._leased.pop(container.id, None)
+        self._remove(container)
+
+    def _remove(self, container) -> None:
+        try:
+            container.remove(force=True)
+        except docker.errors.NotFound:
+            pass
+        except docker.errors.APIError as e:
+            self.logger.error(f"Failed to remove container {container.id}: {e}")
+
+    def sweep_orphans(self) -> int:
+        """Removes pooled containers on this host whose owning process has exited; returns how many."""
+        host = socket.gethostname()
+        removed = 0
+        for container in self.client.containers.list(all=True, filters={'label': POOL_LABEL}):
+            owner_host, _, pid = container.labels.get(OWNER_LABEL, '').rpartition(':')
+            if owner_host != host or not pid.isdigit() or _process_alive(int(pid)):
+                continue
+            self.logger.warning(f"Removing orphaned pooled container {container.id} of exited process {pid}")
+            self._remove(container)
+            removed += 1
+        return removed
+
+    def _sweep(self) -> None:
+        try:
+            self.sweep_orphans()
+        except Exception as e:
+            self.logger.error(f"Orphaned container sweep failed: {e}")
+
+    def _maintain(self) -> None:
+        self._sweep()
+        next_sweep = time.monotonic() + self.orphan_sweep_interval
+        while not self._stop.wait(self.maintenance_interval):
+            if time.monotonic() >= next_sweep:
+                self._sweep()
+                next_sweep = time.monotonic() + self.orphan_sweep_interval
+            with self._lock:
+                keys = list(self._idle)
+            for key in keys:
+                try:
+                    self._maintain_key(key)
+                except Exception as e:
+                    self.logger.error(f"Container pool maintenance failed for {key}: {e}")
+
+    def _maintain_key(self, key) -> None:
+        with self._lock:
+            if key[0] != DEFAULT_IMAGE and time.monotonic() - self._last_lease.get(key, 0) > self.key_ttl:
+                drained = list(self._idle.pop(key, ()))
+                self._last_lease.pop(key, None)
+            else:
+                drained = None
+                idle = list(self._idle[key])
+        if drained is not None:
+            for container in drained:
+                self._remove(container)
+            return
+        unhealthy = [container for container in idle if not self._healthy(container)]
+        if unhealthy:
+            with self._lock:
+                for container in unhealthy:
+                    if container in self._idle[key]:
+                        self._idle[key].remove(container)
+            for container in unhealthy:
+                self.logger.warning(f"Evicting unhealthy pooled container {container.id}")
+                self._remove(container)
+        with self._lock:
+            missing = self.min_idle - len(self._idle[key])
+        for _ in range(max(0, missing)):
+            container = self._spawn(key)
+            with self._lock:
+                self._idle[key].append(container)
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._lock:
+            idle = [container for containers in self._idle.values() for container in containers]
+            self._idle.clear()
+        for container in idle:
+            self._remove(container)
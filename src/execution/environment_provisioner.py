@@ -1,32 +1,65 @@
 import docker
 import logging
 
+from .container_pool import ContainerPool
+from .image_cache import ImageCache
+
 class EnvironmentProvisioner:
-    def __init__(self):
+    def __init__(self, container_pool=None, image_cache=None, sandbox=None):
         self.client = docker.from_env()
         self.logger = logging.getLogger(__name__)
+        container_options = sandbox.container_options if sandbox is not None else None
+        self.pool = container_pool or ContainerPool(self.client, container_options=container_options)
+        self.image_cache = image_cache or ImageCache(self.client)
+        # Leased containers by id, with the environment variables of their current tenant.
+        self._leases = {}
 
-    def create_environment(self, project_config):
+    def create_environment(self, project_config, project_path=None, profile='default'):
         self.logger.info(f"Creating environment for project_config: {project_config}")
-        container = self.client.containers.run(
-            image='python:3.9-slim',
-            command='sleep infinity',
-            detach=True,
-            name=f"env_{project_config}",
-            ports={'8000/tcp': None},
-            environment={'PROJECT_CONFIG': project_config}
-        )
-        self.logger.info(f"Environment created with container ID: {container.id}")
+        # Projects with a dependency manifest run on a cached image with their dependencies installed.
+        image = self.image_cache.image_for(project_path)
+        container = self.pool.lease(image, profile)
+        # Pooled containers are started before the tenant is known, so per-run settings
+        # are passed to every exec instead of the container itself.
+        self._leases[container.id] = (container, {'PROJECT_CONFIG': str(project_config)})
+        self.logger.info(f"Environment leased with container ID: {container.id}")
         return container
 
-    def destroy_environment(self, environment_id):
+    def exec_in_environment(self, environment_id, command, **kwargs):
+        container, environment = self._leases[environment_id]
+        return container.exec_run(command, environment=environment, workdir='/workspace', **kwargs)
+
+    def run_streaming(self, environment_id, command, on_output):
+        """Runs command in the environment, passing (stream, data) to on_output as it arrives; returns the exit code."""
+        container, environment = self._leases[environment_id]
+        exec_id = self.client.api.exec_create(container.id, command, environment=environment, workdir='/workspace')
+        for stdout, stderr in self.client.api.exec_start(exec_id, stream=True, demux=True):
+            if stdout:
+                on_output('stdout', stdout)
+            if stderr:
+                on_output('stderr', stderr)
+        return self.client.api.exec_inspect(exec_id)['ExitCode']
+
+    def destroy_environment(self, environment_id, discard=False):
         self.logger.info(f"Destroying environment with ID: {environment_id}")
+        lease = self._leases.pop(environment_id, None)
+        if lease is not None:
+            container, _ = lease
+            if discard:
+                self.pool.discard(container)
+            else:
+                self.pool.release(container)
+            self.logger.info(f"Environment {environment_id} returned to the pool.")
+            return
         try:
             container = self.client.containers.get(environment_id)
-            container.stop()
-            container.remove()
+            if discard:
+                container.remove(force=True)
+            else:
+                container.stop()
+                container.remove()
             self.logger.info(f"Environment {environment_id} destroyed successfully.")
         except docker.errors.NotFound:
             self.logger.warning(f"Environment {environment_id} not found.")
         except Exception as e:
-            self.logger.error(f"Error destroying environment {environment_id}: {e}")
\ No newline at end of file
+            self.logger.error(f"Error destroying environment {environment_id}: {e}")
@@ -1,27 +1,160 @@
 from celery import Celery
 from .environment_provisioner import EnvironmentProvisioner
 from .security_sandbox import SecuritySandbox
+from .scheduler import ExecutionScheduler
+from .lease_registry import LeaseRegistry, REDIS_URL
 from src.database.node_manager import NodeManager
 from src.database.edge_manager import EdgeManager
+from src.database.log_store import ExecutionLogStore
+from src.database.status_buffer import TERMINAL_STATUSES
 import logging
+import os
+import threading
+import time
+import uuid
 
 # Configure Celery
-celery_app = Celery('execution_manager', broker='redis://localhost:6379/0')
+celery_app = Celery('execution_manager', broker=REDIS_URL)
 
 # Initialize components
-env_provisioner = EnvironmentProvisioner()
 security_sandbox = SecuritySandbox()
+# Pooled containers are started inside the sandbox network, so runs need no per-execution setup.
+env_provisioner = EnvironmentProvisioner(sandbox=security_sandbox)
 node_manager = NodeManager()
 edge_manager = EdgeManager()
+log_store = ExecutionLogStore(node_manager.query_engine)
+lease_registry = LeaseRegistry()
+
+
+def _dispatch(job):
+    if lease_registry.is_terminated(job['execution_id']):
+        # Terminated after the scheduler popped it; its status is already final.
+        scheduler.release(job['execution_id'])
+        return
+    # The task id is recorded before the task is sent, so termination can revoke it while it is queued.
+    task_id = str(uuid.uuid4())
+    lease_registry.update(job['execution_id'], task_id=task_id)
+    celery_app.send_task('tasks.execute_project', args=[job['execution_id'], *job['args']],
+                         queue=f"executions.{job['lane']}", task_id=task_id)
+
+
+scheduler = ExecutionScheduler(_dispatch, node_manager.get_execution_statuses, client=lease_registry.redis)
+
+
+def reclaim_execution(execution_id, status):
+    """
+    Revokes the execution's task and frees its container and sandbox rules. Safe to call
+    repeatedly and from several processes: only the caller that claims the lease does
+    the work, and every step tolerates resources that are already gone.
+    """
+    logger = logging.getLogger(__name__)
+    if not lease_registry.claim(execution_id):
+        return False
+    lease = lease_registry.get(execution_id) or {}
+    if lease.get('task_id'):
+        celery_app.control.revoke(lease['task_id'], terminate=True, signal='SIGKILL')
+    if lease.get('container_id'):
+        env_provisioner.destroy_environment(lease['container_id'], discard=True)
+    if lease.get('rules'):
+        security_sandbox.remove_security_policies(lease['rules'])
+    node_manager.update_execution_status(execution_id, status)
+    node_manager.flush_execution_statuses()
+    lease_registry.remove(execution_id)
+    logger.info(f"Reclaimed resources of execution_id: {execution_id}")
+    return True
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def reconcile_executions(grace):
+    """
+    Fails runs that can no longer make progress, so their rows and scheduler slots are
+    not held forever: Queued rows the scheduler has no job for (e.g. queued before Redis
+    lost its data), and dispatched runs whose lease is gone without a terminal status.
+    Only runs older than grace seconds are considered, so a run that is being submitted
+    or dispatched right now is never mistaken for a lost one.
+    """
+    logger = logging.getLogger(__name__)
+    queued = scheduler.queued()
+    in_flight = scheduler.in_flight()
+    for execution_id in node_manager.get_queued_executions(grace):
+        if execution_id not in queued and execution_id not in in_flight:
+            logger.warning(f"Failing execution_id {execution_id}: queued but unknown to the scheduler")
+            node_manager.update_execution_status(execution_id, 'Failed')
+    now = time.time()
+    lost = [execution_id for execution_id, info in in_flight.items()
+            if now - info['dispatched_at'] > grace and lease_registry.get(execution_id) is None]
+    if lost:
+        statuses = node_manager.get_execution_statuses(lost)
+        for execution_id in lost:
+            if statuses.get(execution_id) not in TERMINAL_STATUSES:
+                logger.warning(f"Failing execution_id {execution_id}: dispatched but its lease is gone")
+                node_manager.update_execution_status(execution_id, 'Failed')
+            scheduler.release(execution_id)
+    node_manager.flush_execution_statuses()
+
+
+def _reap(interval):
+    logger = logging.getLogger(__name__)
+    start_timeout = float(os.getenv("EXECUTION_START_TIMEOUT", "600"))
+    reconcile_interval = float(os.getenv("EXECUTION_RECONCILE_INTERVAL", "60"))
+    next_reconcile = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_reconcile:
+                # Runs at startup too, picking up whatever a previous process left behind.
+                reconcile_executions(reconcile_interval)
+                next_reconcile = time.monotonic() + reconcile_interval
+            for lease in lease_registry.stale():
+                if lease.get('container_id') or lease.get('rules'):
+                    logger.warning(f"Reaping orphaned execution_id: {lease['execution_id']}")
+                    reclaim_execution(lease['execution_id'], 'Failed')
+            # Leases without a container are waiting for a worker; after start_timeout the task is presumed lost.
+            for lease in lease_registry.stale(start_timeout):
+                if not lease.get('container_id') and not lease.get('rules'):
+                    logger.warning(f"Reaping execution_id {lease['execution_id']} that never started")
+                    reclaim_execution(lease['execution_id'], 'Failed')
+        except Exception as e:
+            logger.error(f"Execution reaper pass failed: {e}")
+        time.sleep(interval)
+
+
+def start_reaper():
+    """
+    Starts the background thread that reclaims resources of executions whose worker died,
+    and the scheduler's dispatch loop, so runs queued before a restart are picked up again.
+
+    Both poll Postgres and Redis, so they belong in the process that submits runs (the
+    API, via ExecutionManager) or in a dedicated one (python -m src.execution.execution_manager),
+    never in Celery workers.
+    """
+    global _reaper
+    scheduler.start()
+    with _reaper_lock:
+        if _reaper is None:
+            interval = float(os.getenv("EXECUTION_REAPER_INTERVAL", "2"))
+            _reaper = threading.Thread(target=_reap, args=(interval,), name="execution-reaper", daemon=True)
+            _reaper.start()
 
 class ExecutionManager:
-    def start_execution(self, project_id):
+    def __init__(self):
+        # The process that submits runs also dispatches them and reaps lost ones.
+        start_reaper()
+
+    def start_execution(self, project_id, project_path=None, command=None, user_id=None, interactive=False):
         logger = logging.getLogger(__name__)
         logger.info(f"Starting execution for project_id: {project_id}")
-        execution_id = node_manager.create_execution(project_id)
-        celery_app.send_task('tasks.execute_project', args=[execution_id])
+        execution_id = node_manager.create_execution(project_id, 'Queued')
+        # The scheduler hands the run to Celery once it is admitted and its turn comes up.
+        scheduler.submit(execution_id, project_id, user_id, 'interactive' if interactive else 'batch',
+                         (project_path, command))
         return execution_id
 
+    def scheduler_metrics(self):
+        return scheduler.metrics()
+
     def monitor_execution(self, execution_id):
         logger = logging.getLogger(__name__)
         status = node_manager.get_execution_status(execution_id)
@@ -31,32 +164,70 @@ class ExecutionManager:
     def terminate_execution(self, execution_id):
         logger = logging.getLogger(__name__)
         logger.info(f"Terminating execution_id: {execution_id}")
-        celery_app.control.revoke(execution_id, terminate=True)
-        node_manager.update_execution_status(execution_id, 'Terminated')
-        env_provisioner.destroy_environment(execution_id)
+        # Set first: a run popped by the scheduler but not yet sent is neither queued nor leased.
+        lease_registry.mark_terminated(execution_id)
+        if scheduler.cancel(execution_id):
+            # Never dispatched, so it holds nothing yet.
+            node_manager.update_execution_status(execution_id, 'Terminated')
+            return True
+        reclaim_execution(execution_id, 'Terminated')
         return True
 
-    def get_execution_logs(self, execution_id):
+    def get_execution_logs(self, execution_id, after_seq=-1, limit=500):
+        """Returns up to limit (seq, stream, data) log chunks after after_seq; pass the last seq seen to page forward."""
         logger = logging.getLogger(__name__)
-        logs = node_manager.get_execution_logs(execution_id)
-        logger.info(f"Retrieved logs for execution_id: {execution_id}")
+        logs = log_store.read(execution_id, after_seq, limit)
+        logger.debug(f"Retrieved {len(logs)} log chunks for execution_id: {execution_id}")
         return logs
 
+    def tail_execution_logs(self, execution_id, limit=50):
+        return log_store.tail(execution_id, limit)
+
 @celery_app.task(name='tasks.execute_project')
-def execute_project_task(execution_id):
+def execute_project_task(execution_id, project_path=None, command=None):
     logger = logging.getLogger(__name__)
     logger.info(f"Executing project for execution_id: {execution_id}")
-    try:
-        env = env_provisioner.create_environment(execution_id)
-        security_sandbox.initialize_sandbox(env.id)
-        security_sandbox.enforce_security_policies(execution_id)
-        # Placeholder for actual execution logic
-        # e.g., run scripts, handle processes
-        node_manager.update_execution_status(execution_id, 'Running')
-        # After execution
-        node_manager.update_execution_status(execution_id, 'Completed')
-        env_provisioner.destroy_environment(env.id)
-    except Exception as e:
-        logger.error(f"Execution failed for execution_id: {execution_id} with error: {e}")
-        node_manager.update_execution_status(execution_id, 'Failed')
-        env_provisioner.destroy_environment(env.id)
\ No newline at end of file
+    if lease_registry.is_terminated(execution_id):
+        logger.info(f"Skipping execution_id {execution_id}: it was terminated before it started")
+        lease_registry.remove(execution_id)
+        return
+    env = None
+    rules = []
+    with lease_registry.keepalive(execution_id):
+        try:
+            env = env_provisioner.create_environment(execution_id, project_path)
+            lease_registry.update(execution_id, container_id=env.id)
+            security_sandbox.initialize_sandbox(env.id)
+            rules = security_sandbox.enforce_security_policies(execution_id)
+            lease_registry.update(execution_id, rules=rules)
+            node_manager.update_execution_status(execution_id, 'Running')
+            exit_code = 0
+            if command:
+                # Output is appended to the log store as it is produced, so clients can follow the run.
+                writer = log_store.writer(execution_id)
+                try:
+                    exit_code = env_provisioner.run_streaming(env.id, command, writer.write)
+                finally:
+                    writer.close()
+            node_manager.update_execution_status(execution_id, 'Completed' if exit_code == 0 else 'Failed')
+            env_provisioner.destroy_environment(env.id)
+        except Exception as e:
+            logger.error(f"Execution failed for execution_id: {execution_id} with error: {e}")
+            node_manager.update_execution_status(execution_id, 'Failed')
+            if env is not None:
+                # The container may be in an unknown state, so it is not handed to another tenant.
+                env_provisioner.destroy_environment(env.id, discard=True)
+        finally:
+            security_sandbox.remove_security_policies(rules)
+            # The final status must be in Postgres before the lease disappears, or the
+            # reconciler would take the run for a lost one.
+            node_manager.flush_execution_statuses()
+            lease_registry.remove(execution_id)
+
+
+if __name__ == '__main__':
+    # Standalone scheduler and reaper, for deployments where no API process submits runs.
+    logging.basicConfig(level=logging.INFO)
+    start_reaper()
+    while True:
+        time.sleep(3600)
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+import docker
+
+from .container_pool import DEFAULT_IMAGE
+
+IMAGE_REPOSITORY = 'gcbms-env'
+HASH_LABEL = 'gcbms.manifest_hash'
+
+# Dependency manifests in priority order: the first one found picks the toolchain image
+# and the install step, and the lock files listed with it are copied in when present.
+# Only the dependency layer is baked; sources are copied per run. Test runners are
+# usually dev dependencies, so those are installed too. Dependencies live outside
+# /workspace, which the container pool wipes between tenants.
+MANIFEST_BUILDS = (
+    ('requirements.txt', ('constraints.txt',), 'python:3.9-slim',
+     'RUN cd /deps && pip install --no-cache-dir -r requirements.txt'
+     ' $([ -f constraints.txt ] && echo "-c constraints.txt")'),
+    ('poetry.lock', ('pyproject.toml',), 'python:3.9-slim',
+     'RUN pip install --no-cache-dir poetry && cd /deps'
+     ' && poetry config virtualenvs.create false && poetry install --no-root --no-interaction'),
+    ('package.json', ('package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock'), 'node:18-slim',
+     'RUN cd /deps && if [ -f package-lock.json ] || [ -f npm-shrinkwrap.json ]; then npm ci --no-audit --no-fund;'
+     ' elif [ -f yarn.lock ]; then yarn install --frozen-lockfile --non-interactive;'
+     ' else npm install --no-audit --no-fund; fi\n'
+     'ENV NODE_PATH=/deps/node_modules PATH=/deps/node_modules/.bin:$PATH'),
+    # /root is a tmpfs in pooled containers, so the repository is baked under /deps and
+    # used read-only as Maven's tail repository; anything missing still lands in ~/.m2.
+    ('pom.xml', (), 'maven:3.9-eclipse-temurin-17',
+     'RUN mvn -q -B -Dmaven.repo.local=/deps/.m2 -f /deps/pom.xml dependency:go-offline\n'
+     'ENV MAVEN_OPTS=-Dmaven.repo.local.tail=/deps/.m2'),
+)
+
+
+def find_manifest(project_path: str) -> Optional[tuple]:
+    """Returns (dependency files, base image, install step); the manifest is the first file."""
+    for manifest, lock_files, base_image, install in MANIFEST_BUILDS:
+        path = os.path.join(project_path, manifest)
+        if os.path.isfile(path):
+            files = [path] + [os.path.join(project_path, name) for name in lock_files
+                              if os.path.isfile(os.path.join(project_path, name))]
+            return files, base_image, install
+    return None
+
+
+def manifest_hash(files: list, base_image: str) -> str:
+    """Hash of the base image and every dependency file, so changed locked versions get their own image."""
+    digest = hashlib.sha256()
+    digest.update(base_image.encode())
+    for path in files:
+        digest.update(b'\0')
+        digest.update(os.path.basename(path).encode())
+        digest.update(b'\0')
+        with open(path, 'rb') as dependency_file:
+            digest.update(dependency_file.read())
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Per-project execution images keyed by a hash of the dependency manifest and its
+    lock files.
+
+    Projects with the same dependency files share one image tagged gcbms-env:<hash>, so
+    dependencies are installed once rather than on every run. Last-use times are kept
+    in a small JSON index; when the cached images exceed quota_bytes the least recently
+    used ones are removed. Images still used by containers are skipped.
+    """
+
+    def __init__(self, client, index_path: str = None, quota_bytes: int = None):
+        self.client = client
+        self.index_path = index_path or os.getenv(
+            "IMAGE_CACHE_INDEX", os.path.join(os.path.expanduser("~"), ".cache", "gcbms", "images.json"))
+        self.quota_bytes = quota_bytes or int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._build_locks = defaultdict(threading.Lock)
+
+    def image_for(self, project_path: Optional[str]) -> str:
+        """Returns the tag of the image to run the project in, building it on first use."""
+        if not project_path:
+            return DEFAULT_IMAGE
+        found = find_manifest(project_path)
+        if found is None:
+            return DEFAULT_IMAGE
+        files, base_image, install = found
+        content_hash = manifest_hash(files, base_image)
+        tag = f"{IMAGE_REPOSITORY}:{content_hash[:16]}"
+        with self._build_locks[tag]:
+            try:
+                self.client.images.get(tag)
+            except docker.errors.ImageNotFound:
+                self._build(tag, content_hash, files, base_image, install)
+                self._touch(tag)
+                self.collect_garbage(keep=tag)
+                return tag
+        self._touch(tag)
+        return tag
+
+    def _build(self, tag: str, content_hash: str, files: list, base_image: str, install: str) -> None:
+        self.logger.info(f"Building execution image {tag} from {', '.join(files)}")
+        names = [os.path.basename(path) for path in files]
+        context = tempfile.mkdtemp(prefix='gcbms-image-')
+        try:
+            for path, name in zip(files, names):
+                shutil.copy(path, os.path.join(context, name))
+            with open(os.path.join(context, 'Dockerfile'), 'w') as dockerfile:
+                dockerfile.write(
+                    f"FROM {base_image}\n"
+                    f"LABEL {HASH_LABEL}={content_hash}\n"
+                    "WORKDIR /workspace\n"
+                    f"COPY {' '.join(names)} /deps/\n"
+                    f"{install}\n"
+                )
+            self.client.images.build(path=context, tag=tag, rm=True, forcerm=True)
+        finally:
+            shutil.rmtree(context, ignore_errors=True)
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path) as index:
+                return json.load(index)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, entries: dict) -> None:
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as index:
+            json.dump(entries, index)
+        os.replace(temp_path, self.index_path)
+
+    def _touch(self, tag: str) -> None:
+        with self._lock:
+            entries = self._load_index()
+            entries[tag] = time.time()
+            self._save_index(entries)
+
+    def _disk_usage(self) -> dict:
+        """
+        image id -> (cached tags, bytes held by that image alone, bytes it shares with other
+        images), from the daemon's disk usage report. Tagged images share their base layers,
+        so their summed Size would count those layers once per image.
+        """
+        usage = {}
+        for image in self.client.df().get('Images') or []:
+            tags = [tag for tag in image.get('RepoTags') or [] if tag.startswith(f"{IMAGE_REPOSITORY}:")]
+            if not tags or HASH_LABEL not in (image.get('Labels') or {}):
+                continue
+            # SharedSize is -1 when the daemon did not compute it.
+            shared = max(image.get('SharedSize', -1), 0)
+            usage[image['Id']] = (tags, image.get('Size', 0) - shared, shared)
+        return usage
+
+    def collect_garbage(self, keep: str = None) -> None:
+        """
+        Removes least recently used images until the cached images fit within the quota.
+        Usage counts each image's own layers plus the largest set of shared layers once,
+        and is re-read after every removal, since layers an evicted image shared may now
+        belong to a single survivor.
+        """
+        with self._lock:
+            entries = self._load_index()
+            kept = set()
+            while True:
+                usage = self._disk_usage()
+                live = {tag for tags, _, _ in usage.values() for tag in tags}
+                total = sum(unique for _, unique, _ in usage.values()) + \
+                    max((shared for _, _, shared in usage.values()), default=0)
+                candidates = sorted(
+                    (max(entries.get(tag, 0) for tag in tags), image_id)
+                    for image_id, (tags, _, _) in usage.items() if keep not in tags and image_id not in kept
+                )
+                if total <= self.quota_bytes or not candidates:
+                    break
+                _, image_id = candidates[0]
+                tags, unique, _ = usage[image_id]
+                try:
+                    # The layers are only freed once the last tag is gone.
+                    for tag in tags:
+                        self.client.images.remove(tag)
+                        entries.pop(tag, None)
+                except docker.errors.APIError as e:
+                    self.logger.info(f"Keeping execution image {image_id}: {e}")
+                    kept.add(image_id)
+                    continue
+                self.logger.info(
+                    f"Removed execution image {', '.join(tags)} ({unique} bytes) to stay within the image quota")
+            self._save_index({tag: used for tag, used in entries.items() if tag in live})
@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_LEASE_PREFIX = "gcbms:lease:"
+_LEASE_INDEX = "gcbms:leases"
+# Leases that never start running (e.g. a task lost by the broker) expire on their own.
+_LEASE_EXPIRY = 24 * 3600
+
+
+class LeaseRegistry:
+    """
+    Shared record of what each execution holds: its Celery task id, its container and
+    its sandbox rules.
+
+    Entries live in Redis so the API process that terminates a run and the worker that
+    runs it see the same lease. Workers heartbeat their leases while they run; a lease
+    whose heartbeat is older than ttl seconds belongs to a dead worker and may be
+    reclaimed by anyone. claim() makes sure only one process reclaims a given lease.
+    """
+
+    def __init__(self, client=None, ttl: float = None):
+        self.redis = client or redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        self.ttl = ttl or float(os.getenv("EXECUTION_LEASE_TTL", "15"))
+        self.logger = logging.getLogger(__name__)
+
+    def _key(self, execution_id) -> str:
+        return f"{_LEASE_PREFIX}{execution_id}"
+
+    def update(self, execution_id, **fields) -> None:
+        values = {name: json.dumps(value) for name, value in fields.items()}
+        values['execution_id'] = json.dumps(execution_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key(execution_id), mapping=values)
+        pipe.expire(self._key(execution_id), _LEASE_EXPIRY)
+        pipe.zadd(_LEASE_INDEX, {str(execution_id): time.time()})
+        pipe.execute()
+
+    def heartbeat(self, execution_id) -> None:
+        self.redis.zadd(_LEASE_INDEX, {str(execution_id): time.time()}, xx=True)
+
+    def get(self, execution_id) -> Optional[dict]:
+        values = self.redis.hgetall(self._key(execution_id))
+        if not values:
+            return None
+        return {name: json.loads(value) for name, value in values.items()}
+
+    def claim(self, execution_id, timeout: float = 30) -> bool:
+        """Returns True for the one caller allowed to reclaim the lease until timeout expires."""
+        return bool(self.redis.set(f"{self._key(execution_id)}:claim", 1, nx=True, ex=int(timeout)))
+
+    def mark_terminated(self, execution_id) -> None:
+        """
+        Records that the run was terminated. The tombstone outlives the lease, so a run
+        already taken off the queue but not yet sent to (or started by) a worker is dropped.
+        """
+        self.redis.set(f"{self._key(execution_id)}:terminated", 1, ex=_LEASE_EXPIRY)
+
+    def is_terminated(self, execution_id) -> bool:
+        return bool(self.redis.exists(f"{self._key(execution_id)}:terminated"))
+
+    def remove(self, execution_id) -> None:
+        pipe = self.redis.pipeline()
+        pipe.delete(self._key(execution_id), f"{self._key(execution_id)}:claim")
+        pipe.zrem(_LEASE_INDEX, str(execution_id))
+        pipe.execute()
+
+    def stale(self, age: float = None) -> list:
+        """Leases not updated or heartbeated within age seconds (ttl by default)."""
+        members = self.redis.zrangebyscore(_LEASE_INDEX, 0, time.time() - (age or self.ttl))
+        leases = []
+        for member in members:
+            lease = self.get(member)
+            if lease is None:
+                self.redis.zrem(_LEASE_INDEX, member)
+            else:
+                leases.append(lease)
+        return leases
+
+    @contextmanager
+    def keepalive(self, execution_id):
+        """Heartbeats the lease from a background thread for as long as the block runs."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.ttl / 3):
+                try:
+                    self.heartbeat(execution_id)
+                except redis.RedisError as e:
+                    self.logger.warning(f"Failed to heartbeat lease for execution {execution_id}: {e}")
+
+        thread = threading.Thread(target=beat, name=f"lease-{execution_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
@@ -0,0 +1,308 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import redis
+
+from src.database.status_buffer import TERMINAL_STATUSES
+from .lease_registry import REDIS_URL
+
+# Interactive runs are dispatched ahead of batch runs. Workers should consume the queues in
+# this order (celery worker -Q executions.interactive,executions.batch) so the broker
+# preserves the priority too.
+LANES = ('interactive', 'batch')
+_WAIT_SAMPLES = 1000
+
+_KEY_PREFIX = "gcbms:scheduler"
+_IN_FLIGHT_KEY = f"{_KEY_PREFIX}:in_flight"
+_WEIGHTS_KEY = f"{_KEY_PREFIX}:weights"
+_STATS_KEY = f"{_KEY_PREFIX}:stats"
+_WAITS_KEY = f"{_KEY_PREFIX}:waits"
+
+# Queue layout, per lane (prefix = gcbms:scheduler:<lane>):
+#   <prefix>:ring                  zset of users with queued runs, in round-robin order
+#   <prefix>:deficit               hash user -> deficit round robin credit
+#   <prefix>:projects:<user>       zset of the user's projects with queued runs, in round-robin order
+#   <prefix>:runs:<user>:<project> list of queued execution ids, oldest first
+#   <prefix>:depth, <prefix>:user_depth   queued runs in the lane, overall and per user
+# and, across lanes, gcbms:scheduler:jobs (execution id -> job), gcbms:scheduler:slots
+# (execution id -> [lane, user, project]), gcbms:scheduler:seq (ordering counter) and
+# gcbms:scheduler:streak (interactive runs dispatched since the last batch run).
+# Every change goes through one of the scripts below, so each is atomic on its own and
+# touches only the queues involved rather than the whole scheduler state.
+
+_LUA_COMMON = """
+local root = ARGV[1]
+local function lane_key(lane, suffix) return root .. ':' .. lane .. ':' .. suffix end
+local function next_seq() return redis.call('INCR', root .. ':seq') end
+
+local function enqueue(lane, user, project, id, front)
+    local runs = lane_key(lane, 'runs:' .. user .. ':' .. project)
+    if front then redis.call('LPUSH', runs, id) else redis.call('RPUSH', runs, id) end
+    local projects = lane_key(lane, 'projects:' .. user)
+    if not redis.call('ZSCORE', projects, project) then
+        redis.call('ZADD', projects, front and 0 or next_seq(), project)
+    end
+    local ring = lane_key(lane, 'ring')
+    if not redis.call('ZSCORE', ring, user) then
+        redis.call('ZADD', ring, front and 0 or next_seq(), user)
+    end
+    redis.call('INCR', lane_key(lane, 'depth'))
+    redis.call('HINCRBY', lane_key(lane, 'user_depth'), user, 1)
+end
+
+local function forget(lane, user, project, id)
+    local runs = lane_key(lane, 'runs:' .. user .. ':' .. project)
+    local projects = lane_key(lane, 'projects:' .. user)
+    if redis.call('LLEN', runs) == 0 then redis.call('ZREM', projects, project) end
+    if redis.call('ZCARD', projects) == 0 then
+        -- Idle users do not bank deficit for later.
+        redis.call('ZREM', lane_key(lane, 'ring'), user)
+        redis.call('HDEL', lane_key(lane, 'deficit'), user)
+    end
+    redis.call('DECR', lane_key(lane, 'depth'))
+    if redis.call('HINCRBY', lane_key(lane, 'user_depth'), user, -1) <= 0 then
+        redis.call('HDEL', lane_key(lane, 'user_depth'), user)
+    end
+    redis.call('HDEL', root .. ':slots', id)
+    local job = redis.call('HGET', root .. ':jobs', id)
+    redis.call('HDEL', root .. ':jobs', id)
+    return job
+end
+"""
+
+# ARGV: root, lane, user, project, execution id, job json, front (0/1)
+_SUBMIT_SCRIPT = _LUA_COMMON + """
+local lane, user, project, id = ARGV[2], ARGV[3], ARGV[4], ARGV[5]
+if redis.call('HEXISTS', root .. ':slots', id) == 1 then return 0 end
+redis.call('HSET', root .. ':jobs', id, ARGV[6])
+redis.call('HSET', root .. ':slots', id, cjson.encode({lane, user, project}))
+enqueue(lane, user, project, id, ARGV[7] == '1')
+return 1
+"""
+
+# ARGV: root, execution id
+_CANCEL_SCRIPT = _LUA_COMMON + """
+local id = ARGV[2]
+local slot = redis.call('HGET', root .. ':slots', id)
+if not slot then return 0 end
+slot = cjson.decode(slot)
+redis.call('LREM', lane_key(slot[1], 'runs:' .. slot[2] .. ':' .. slot[3]), 1, id)
+forget(slot[1], slot[2], slot[3], id)
+return 1
+"""
+
+# ARGV: root, slots, interactive share, now, lanes...
+# Pops runs while fewer than slots are in flight and marks them in flight; returns their jobs.
+_DISPATCH_SCRIPT = _LUA_COMMON + """
+local slots, share, now = tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+local interactive, batch = ARGV[5], ARGV[6]
+local in_flight_key = root .. ':in_flight'
+local streak = tonumber(redis.call('GET', root .. ':streak') or '0')
+local jobs = {}
+
+local function pop(lane)
+    local ring = lane_key(lane, 'ring')
+    local deficits = lane_key(lane, 'deficit')
+    while true do
+        local user = redis.call('ZRANGE', ring, 0, 0)[1]
+        if not user then return nil end
+        local deficit = tonumber(redis.call('HGET', deficits, user) or '0')
+        if deficit < 1 then
+            local weight = tonumber(redis.call('HGET', root .. ':weights', user) or '1')
+            redis.call('HSET', deficits, user, deficit + weight)
+            redis.call('ZADD', ring, next_seq(), user)
+        else
+            local projects = lane_key(lane, 'projects:' .. user)
+            local project = redis.call('ZRANGE', projects, 0, 0)[1]
+            local id = redis.call('LPOP', lane_key(lane, 'runs:' .. user .. ':' .. project))
+            redis.call('ZADD', projects, next_seq(), project)
+            redis.call('HSET', deficits, user, deficit - 1)
+            return id, forget(lane, user, project, id)
+        end
+    end
+end
+
+while redis.call('HLEN', in_flight_key) < slots do
+    local waiting = tonumber(redis.call('GET', lane_key(interactive, 'depth')) or '0')
+    local batch_waiting = tonumber(redis.call('GET', lane_key(batch, 'depth')) or '0')
+    local lane
+    if waiting > 0 and (batch_waiting == 0 or streak < share) then
+        lane, streak = interactive, streak + 1
+    elseif batch_waiting > 0 then
+        lane, streak = batch, 0
+    else
+        break
+    end
+    local id, job = pop(lane)
+    if not id then
+        -- The depth counter disagrees with the queues; trust the queues.
+        redis.call('SET', lane_key(lane, 'depth'), 0)
+        break
+    end
+    redis.call('HSET', in_flight_key, id, cjson.encode({lane = lane, dispatched_at = tonumber(now)}))
+    table.insert(jobs, job)
+end
+redis.call('SET', root .. ':streak', streak)
+return jobs
+"""
+
+
+def _execution_id(value: str):
+    return int(value) if value.isdigit() else value
+
+
+class ExecutionScheduler:
+    """
+    Admission control and fair-share dispatch in front of the Celery execution queues.
+
+    Submitted runs wait in per-lane fair queues and are handed to dispatch() only while
+    fewer than slots runs are in flight, so the broker never holds more work than the
+    container pool can start. In-flight runs are released when their status turns
+    terminal. While both lanes have work, interactive_share interactive runs are
+    dispatched for every batch run, so batch work is never starved completely.
+
+    Queues, in-flight runs and user weights live in Redis, so they survive restarts and
+    every API process shares one admission limit. Each user's and project's queue is a
+    Redis list and the round-robin rings are sorted sets; submit, cancel and dispatch are
+    Lua scripts that touch only the queues involved, so each is atomic and costs the same
+    however many runs are waiting. Start the dispatch loop in one long-lived process (the
+    API); running it in more is safe but only adds polling.
+    """
+
+    def __init__(self, dispatch, status_source, slots: int = None, interactive_share: int = None,
+                 poll_interval: float = None, client=None):
+        self.dispatch = dispatch
+        self.status_source = status_source
+        self.redis = client or redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        self.slots = slots or int(os.getenv("EXECUTION_SLOTS", "16"))
+        self.interactive_share = interactive_share or int(os.getenv("EXECUTION_INTERACTIVE_SHARE", "4"))
+        self.poll_interval = poll_interval or float(os.getenv("EXECUTION_SCHEDULER_INTERVAL", "0.5"))
+        self.logger = logging.getLogger(__name__)
+        self._submit_script = self.redis.register_script(_SUBMIT_SCRIPT)
+        self._cancel_script = self.redis.register_script(_CANCEL_SCRIPT)
+        self._dispatch_script = self.redis.register_script(_DISPATCH_SCRIPT)
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _lane_key(self, lane: str, suffix: str) -> str:
+        return f"{_KEY_PREFIX}:{lane}:{suffix}"
+
+    def start(self) -> None:
+        """Starts this process's dispatch loop; queued runs are only dispatched while some process runs one."""
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="execution-scheduler", daemon=True)
+                self._thread.start()
+
+    def submit(self, execution_id, project_id, user_id=None, lane: str = 'batch', args: tuple = ()) -> None:
+        if lane not in LANES:
+            raise ValueError(f"Unknown execution lane: {lane}")
+        job = {
+            'execution_id': execution_id,
+            'project_id': project_id,
+            'user_id': user_id,
+            'lane': lane,
+            'args': list(args),
+            'submitted_at': time.time(),
+        }
+        self._enqueue(job)
+        self._wakeup.set()
+
+    def _enqueue(self, job: dict, front: bool = False) -> None:
+        self._submit_script(args=[
+            _KEY_PREFIX, job['lane'], str(job['user_id']), str(job['project_id']), str(job['execution_id']),
+            json.dumps(job), int(front),
+        ])
+
+    def set_user_weight(self, user_id, weight: float) -> None:
+        if weight <= 0:
+            raise ValueError("User weight must be positive")
+        self.redis.hset(_WEIGHTS_KEY, str(user_id), weight)
+
+    def cancel(self, execution_id) -> bool:
+        """Drops a run that has not been dispatched yet; returns False if it already left the queue."""
+        return bool(self._cancel_script(args=[_KEY_PREFIX, str(execution_id)]))
+
+    def release(self, execution_id) -> None:
+        self.redis.hdel(_IN_FLIGHT_KEY, str(execution_id))
+        self._wakeup.set()
+
+    def queued(self) -> set:
+        """Ids of runs waiting in any lane."""
+        return {_execution_id(execution_id) for execution_id in self.redis.hkeys(f"{_KEY_PREFIX}:jobs")}
+
+    def in_flight(self) -> dict:
+        """Dispatched runs that have not reached a terminal status, with their lane and dispatch time."""
+        return {_execution_id(execution_id): json.loads(info)
+                for execution_id, info in self.redis.hgetall(_IN_FLIGHT_KEY).items()}
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self._release_finished()
+                self._dispatch_ready()
+            except Exception as e:
+                self.logger.error(f"Execution scheduler pass failed: {e}")
+
+    def _release_finished(self) -> None:
+        in_flight = list(self.in_flight())
+        if not in_flight:
+            return
+        statuses = self.status_source(in_flight)
+        finished = [str(execution_id) for execution_id in in_flight if statuses.get(execution_id) in TERMINAL_STATUSES]
+        if finished:
+            self.redis.hdel(_IN_FLIGHT_KEY, *finished)
+
+    def _dispatch_ready(self) -> None:
+        # Cheap checks first, so idle passes do not run the script.
+        pipe = self.redis.pipeline()
+        pipe.hlen(_IN_FLIGHT_KEY)
+        for lane in LANES:
+            pipe.get(self._lane_key(lane, 'depth'))
+        in_flight, *depths = pipe.execute()
+        if in_flight >= self.slots or not any(int(depth or 0) for depth in depths):
+            return
+        now = time.time()
+        jobs = [json.loads(job) for job in self._dispatch_script(args=[
+            _KEY_PREFIX, self.slots, self.interactive_share, now, *LANES,
+        ])]
+        if not jobs:
+            return
+        pipe = self.redis.pipeline()
+        for job in jobs:
+            pipe.hincrby(_STATS_KEY, f"dispatched:{job['lane']}", 1)
+            pipe.lpush(f"{_WAITS_KEY}:{job['lane']}", now - job['submitted_at'])
+        for lane in LANES:
+            pipe.ltrim(f"{_WAITS_KEY}:{lane}", 0, _WAIT_SAMPLES - 1)
+        pipe.execute()
+        for job in jobs:
+            try:
+                self.dispatch(job)
+            except Exception as e:
+                # Keep the run and its place in line; the next pass retries it.
+                self.logger.error(f"Failed to dispatch execution {job['execution_id']}: {e}")
+                self._enqueue(job, front=True)
+                self.redis.hdel(_IN_FLIGHT_KEY, str(job['execution_id']))
+
+    def metrics(self) -> dict:
+        """Queue depth, in-flight count and recent queue wait times, for sizing workers."""
+        stats = self.redis.hgetall(_STATS_KEY)
+        lanes = {}
+        for lane in LANES:
+            waits = sorted(float(wait) for wait in self.redis.lrange(f"{_WAITS_KEY}:{lane}", 0, -1))
+            lanes[lane] = {
+                'depth': int(self.redis.get(self._lane_key(lane, 'depth')) or 0),
+                'depth_by_user': {user: int(depth) for user, depth
+                                  in self.redis.hgetall(self._lane_key(lane, 'user_depth')).items()},
+                'dispatched': int(stats.get(f"dispatched:{lane}", 0)),
+                'wait_p50': waits[len(waits) // 2] if waits else 0.0,
+                'wait_p95': waits[int(len(waits) * 0.95)] if waits else 0.0,
+                'wait_max': waits[-1] if waits else 0.0,
+            }
+        return {'slots': self.slots, 'in_flight': self.redis.hlen(_IN_FLIGHT_KEY), 'lanes': lanes}
@@ -1,24 +1,90 @@
 import subprocess
 import logging
+import os
+import threading
+
+import docker
+
+# Docker networks used for sandbox containers, by policy name. They are created once and
+# shared, so per-run setup never touches the host's packet filter. Internal networks have
+# no route off the host.
+NETWORK_POLICIES = {
+    'isolated': {'internal': True},
+    'egress': {'internal': False},
+}
 
 class SecuritySandbox:
-    def __init__(self):
+    def __init__(self, client=None, network_policy=None, apparmor_profile=None, apparmor_file=None):
         self.logger = logging.getLogger(__name__)
+        self._client = client
+        self.network_policy = network_policy or os.getenv("SANDBOX_NETWORK_POLICY", "isolated")
+        self.apparmor_profile = apparmor_profile or os.getenv("SANDBOX_APPARMOR_PROFILE", "docker-default")
+        # Custom profile source, loaded into the kernel once per process when set.
+        self.apparmor_file = apparmor_file or os.getenv("SANDBOX_APPARMOR_FILE")
+        self._networks = {}
+        self._apparmor_loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = docker.from_env()
+        return self._client
+
+    def network_for(self, policy):
+        with self._lock:
+            name = self._networks.get(policy)
+            if name is not None:
+                return name
+            name = f"gcbms-sandbox-{policy}"
+            try:
+                self.client.networks.get(name)
+            except docker.errors.NotFound:
+                self.logger.info(f"Creating sandbox network {name}")
+                try:
+                    self.client.networks.create(name, driver='bridge', labels={'gcbms.policy': policy},
+                                                **NETWORK_POLICIES[policy])
+                except docker.errors.APIError as e:
+                    # Another process created it first.
+                    if e.status_code != 409:
+                        raise
+            self._networks[policy] = name
+            return name
+
+    def container_options(self):
+        """Options for containers.run that place a container under the sandbox policy."""
+        return {
+            'network': self.network_for(self.network_policy),
+            'security_opt': [f'apparmor={self.apparmor_profile}', 'no-new-privileges'],
+            'cap_drop': ['NET_RAW'],
+        }
 
     def initialize_sandbox(self, environment_id):
-        self.logger.info(f"Initializing sandbox for environment_id: {environment_id}")
-        # Example: Apply AppArmor profile
-        try:
-            subprocess.run(['apparmor_parser', '-r', '/etc/apparmor.d/docker'], check=True)
-            self.logger.info("AppArmor profile applied successfully.")
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Failed to apply AppArmor profile: {e}")
+        self.logger.debug(f"Initializing sandbox for environment_id: {environment_id}")
+        if self._apparmor_loaded or not self.apparmor_file:
+            return
+        with self._lock:
+            if self._apparmor_loaded:
+                return
+            try:
+                subprocess.run(['apparmor_parser', '-r', self.apparmor_file], check=True)
+                self._apparmor_loaded = True
+                self.logger.info("AppArmor profile applied successfully.")
+            except subprocess.CalledProcessError as e:
+                self.logger.error(f"Failed to apply AppArmor profile: {e}")
 
     def enforce_security_policies(self, execution_id):
-        self.logger.info(f"Enforcing security policies for execution_id: {execution_id}")
-        # Example: Restrict network access using iptables
-        try:
-            subprocess.run(['iptables', '-A', 'OUTPUT', '-p', 'tcp', '--dport', '80', '-j', 'DROP'], check=True)
-            self.logger.info("Network restrictions applied successfully.")
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Failed to apply network restrictions: {e}")
\ No newline at end of file
+        """
+        Returns host rules added for the execution. Network policy is applied per
+        container through its sandbox network, so none are added anymore.
+        """
+        self.logger.debug(f"Security policies for execution_id {execution_id} applied by network {self.network_policy}")
+        return []
+
+    def remove_security_policies(self, rules):
+        # Only leases recorded before network policies were introduced still carry host rules.
+        for rule in rules:
+            # A rule that is already gone makes iptables fail; that is the desired end state.
+            result = subprocess.run(['iptables', '-D'] + rule, capture_output=True)
+            if result.returncode != 0:
+                self.logger.debug(f"Rule {rule} was already removed")
@@ -1,14 +1,46 @@
 import os
-from typing import List
+from collections import deque
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterator, List
+from .parser_interface import module_name_for
 from .python_parser import PythonParser
 from .javascript_parser import JavaScriptParser
 from .java_parser import JavaParser
-from .dependency_analyzer import DependencyAnalyzer
+from .dependency_analyzer import DependencyAnalyzer, EXTRACTOR_VERSION
 from .documentation_extractor import DocumentationExtractor
+from .incremental_parser import IncrementalParser
+from .parse_cache import DEFAULT_MAX_BYTES, ParseCache, cache_key, hash_content
+
+# Each worker process builds its own CodeParser once and reuses it for every file it is sent.
+_worker_parser = None
+
+
+def _init_worker(cache_path, cache_max_bytes):
+    global _worker_parser
+    _worker_parser = CodeParser(cache_path, cache_max_bytes)
+    if _worker_parser.cache is not None:
+        # Pool workers leave through os._exit, which skips atexit; multiprocessing still
+        # runs its finalizers, so batched cache access times are written on the way out.
+        Finalize(_worker_parser, _worker_parser.cache.close, exitpriority=10)
+
+
+def _decode_source(content: bytes) -> str:
+    """UTF-8 without a BOM and with newlines normalised, as a text-mode read would give; used on every path."""
+    return content.decode('utf-8-sig').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _parse_chunk_worker(tasks):
+    return [
+        _worker_parser.parse_file(file_path, language, module_name)
+        for file_path, language, module_name in tasks
+    ]
+
 
 class CodeParser:
     
-    def __init__(self):
+    def __init__(self, cache_path: str = None, cache_max_bytes: int = DEFAULT_MAX_BYTES):
         self.parsers = {
             'Python': PythonParser(),
             'JavaScript': JavaScriptParser(),
@@ -16,42 +48,77 @@ class CodeParser:
         }
         self.dependency_analyzer = DependencyAnalyzer()
         self.documentation_extractor = DocumentationExtractor()
+        self.cache_path = cache_path or os.getenv("PARSE_CACHE_PATH")
+        self.cache_max_bytes = cache_max_bytes
+        self.cache = ParseCache(self.cache_path, cache_max_bytes) if self.cache_path else None
     
-    def parse_file(self, file_path: str, language: str):
+    def parse_file(self, file_path: str, language: str, module_name: str = None):
         parser = self.parsers.get(language)
         if not parser:
             raise ValueError(f"Unsupported language: {language}")
-        ast_tree = parser.parse_file(file_path)
-        imports = self.dependency_analyzer.analyze_imports(ast_tree)
-        function_calls = self.dependency_analyzer.analyze_function_calls(ast_tree)
-        inheritances = self.dependency_analyzer.analyze_class_inheritance(ast_tree)
-        docstrings = self.documentation_extractor.extract_docstrings(ast_tree)
-        comments = self.documentation_extractor.extract_comments(ast_tree)
-        return {
-            'imports': imports,
-            'function_calls': function_calls,
-            'inheritances': inheritances,
-            'docstrings': docstrings,
-            'comments': comments
-        }
+        if module_name is None:
+            module_name = module_name_for(file_path)
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        if self.cache is None:
+            return self._extract_facts(file_path, parser.parse_source(_decode_source(content), file_path), module_name)
+        key = cache_key(hash_content(content), language, module_name, EXTRACTOR_VERSION)
+        facts = self.cache.get(key)
+        if facts is None:
+            facts = self._extract_facts(file_path, parser.parse_source(_decode_source(content), file_path), module_name)
+            self.cache.put(key, facts)
+        facts['file'] = file_path
+        return facts
+
+    def _extract_facts(self, file_path: str, ast_tree, module_name: str) -> dict:
+        facts = self.dependency_analyzer.extract_facts(ast_tree, module_name)
+        facts['file'] = file_path
+        facts['comments'] = self.documentation_extractor.extract_comments(ast_tree)
+        return facts
     
-    def parse_directory(self, directory_path: str, language: str):
+    def parse_directory(self, directory_path: str, language: str, workers: int = 1, chunksize: int = None) -> List[dict]:
+        """Parses every file of the given language under directory_path; see iter_parse_directory."""
+        return list(self.iter_parse_directory(directory_path, language, workers, chunksize))
+
+    def iter_parse_directory(self, directory_path: str, language: str, workers: int = 1, chunksize: int = 16) -> Iterator[dict]:
+        """
+        Yields the extracted facts of one file at a time, in sorted file order.
+
+        With workers > 1 files are sent to a process pool in chunks; workers send back only
+        the extracted facts, never ASTs. At most two chunks per worker are in flight, so memory
+        stays bounded by the chunk size rather than by the size of the repository.
+        """
         parser = self.parsers.get(language)
         if not parser:
             raise ValueError(f"Unsupported language: {language}")
-        ast_trees = parser.parse_directory(directory_path)
-        results = []
-        for ast_tree in ast_trees:
-            imports = self.dependency_analyzer.analyze_imports(ast_tree)
-            function_calls = self.dependency_analyzer.analyze_function_calls(ast_tree)
-            inheritances = self.dependency_analyzer.analyze_class_inheritance(ast_tree)
-            docstrings = self.documentation_extractor.extract_docstrings(ast_tree)
-            comments = self.documentation_extractor.extract_comments(ast_tree)
-            results.append({
-                'imports': imports,
-                'function_calls': function_calls,
-                'inheritances': inheritances,
-                'docstrings': docstrings,
-                'comments': comments
-            })
-        return results
\ No newline at end of file
+        file_paths = parser.iter_files(directory_path)
+        if workers <= 1:
+            for file_path in file_paths:
+                yield self.parse_file(file_path, language, module_name_for(file_path, directory_path))
+            return
+        chunksize = chunksize or 16
+        tasks = (
+            (file_path, language, module_name_for(file_path, directory_path))
+            for file_path in file_paths
+        )
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.cache_path, self.cache_max_bytes)) as pool:
+            in_flight = deque()
+            while True:
+                while len(in_flight) < workers * 2:
+                    chunk = list(islice(tasks, chunksize))
+                    if not chunk:
+                        break
+                    in_flight.append(pool.submit(_parse_chunk_worker, chunk))
+                if not in_flight:
+                    return
+                yield from in_flight.popleft().result()
+
+    def parse_directory_incremental(self, directory_path: str, language: str, manifest_path: str,
+                                    apply_diff: Callable[[dict], None]) -> dict:
+        """
+        Re-parses only the files that changed since the last run recorded in manifest_path,
+        passes the resulting graph diff to apply_diff (e.g. EdgeManager.apply_graph_diff)
+        and records the run in the manifest once it has been applied. Returns the diff.
+        """
+        return IncrementalParser(self, manifest_path).parse_directory(directory_path, language, apply_diff)
@@ -1,10 +1,320 @@
-from typing import List
+from typing import Dict, List, Optional
+import ast
 from ast import AST
 import esprima
 import javalang
+from .documentation_extractor import DocumentationExtractor
+
+# Bump whenever the shape or content of extracted facts changes; it keys the parse cache.
+EXTRACTOR_VERSION = 2
+
+
+class _FactsCollector:
+    """
+    Output records shared by the per-language collectors. Every collector walks its tree
+    once and fills the same lists, so downstream consumers never branch on language.
+    """
+
+    def __init__(self, module_name: str):
+        self.module_name = module_name
+        self.scope: List[str] = [module_name] if module_name else []
+        self.imports: List[str] = []
+        self.import_details: List[Dict] = []
+        self.function_calls: List[str] = []
+        self.calls: List[Dict] = []
+        self.inheritances: List[str] = []
+        self.docstrings: List[str] = []
+        self.definitions: List[Dict] = []
+
+    def _qualify(self, name: str) -> str:
+        return '.'.join(self.scope + [name])
+
+    def add_import(self, statement: str, module: str, names: List[str], lineno: Optional[int]) -> None:
+        self.imports.append(statement)
+        self.import_details.append({'module': module, 'names': names, 'lineno': lineno})
+
+    def add_call(self, name: str, lineno: Optional[int]) -> None:
+        self.function_calls.append(name)
+        self.calls.append({'name': name, 'caller': '.'.join(self.scope), 'lineno': lineno})
+
+    def add_definition(self, kind: str, name: str, lineno: Optional[int], end_lineno: Optional[int] = None,
+                       bases: List[str] = None, interfaces: List[str] = None, docstring: str = None) -> None:
+        if docstring:
+            self.docstrings.append(docstring)
+        self.inheritances.extend(bases or [])
+        self.inheritances.extend(interfaces or [])
+        self.definitions.append({
+            'kind': kind,
+            'name': name,
+            'qualified_name': self._qualify(name),
+            'lineno': lineno,
+            'end_lineno': end_lineno,
+            'bases': bases or [],
+            'interfaces': interfaces or [],
+            'docstring': docstring,
+        })
+
+    def result(self) -> Dict:
+        return {
+            'module': self.module_name,
+            'imports': self.imports,
+            'function_calls': self.function_calls,
+            'inheritances': self.inheritances,
+            'docstrings': self.docstrings,
+            'definitions': self.definitions,
+            'calls': self.calls,
+            'import_details': self.import_details,
+        }
+
+
+def _dotted_name(node) -> Optional[str]:
+    """'a.b.C' for a Name/Attribute chain, None for anything else (calls, subscripts)."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+class _PythonFactsCollector(ast.NodeVisitor, _FactsCollector):
+    """Collects imports, calls, inheritance, definitions and docstrings from a Python AST in one traversal."""
+
+    def visit_Module(self, node):
+        docstring = ast.get_docstring(node)
+        if docstring:
+            self.docstrings.append(docstring)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.add_import(f"import {alias.name}", alias.name, [], node.lineno)
+
+    def visit_ImportFrom(self, node):
+        module = self._resolve_relative(node.module, node.level)
+        self.add_import(f"from {node.module} import ...", module, [alias.name for alias in node.names], node.lineno)
+
+    def _resolve_relative(self, module: Optional[str], level: int) -> str:
+        """Absolute name of a (possibly relative) import target, resolved against this module's package."""
+        if not level:
+            return module or ''
+        parts = self.module_name.split('.')[:-level] if self.module_name else []
+        if module:
+            parts.append(module)
+        return '.'.join(parts)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            self.add_call(node.func.id, node.lineno)
+        elif isinstance(node.func, ast.Attribute):
+            self.add_call(node.func.attr, node.lineno)
+        self.generic_visit(node)
+
+    def visit_ClassDef(self, node):
+        bases = []
+        for base in node.bases:
+            if isinstance(base, ast.Name):
+                bases.append(base.id)
+            elif isinstance(base, ast.Attribute):
+                name = _dotted_name(base)
+                if name:
+                    bases.append(name)
+        self._visit_definition(node, 'class', bases)
+
+    def visit_FunctionDef(self, node):
+        self._visit_definition(node, 'function')
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _visit_definition(self, node, kind: str, bases: List[str] = None):
+        self.add_definition(kind, node.name, node.lineno, node.end_lineno, bases=bases,
+                            docstring=ast.get_docstring(node))
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+
+# Keys that hold metadata rather than child nodes in esprima's ESTree objects.
+_ESTREE_SKIP_KEYS = {'type', 'loc', 'range', 'comments', 'leadingComments', 'trailingComments'}
+
+
+def _estree_name(node) -> Optional[str]:
+    if node is None:
+        return None
+    if node.type == 'Identifier':
+        return node.name
+    if node.type == 'MemberExpression':
+        obj = _estree_name(node.object)
+        prop = _estree_name(node.property)
+        return f"{obj}.{prop}" if obj and prop else prop
+    if node.type == 'ThisExpression':
+        return 'this'
+    return None
+
+
+def _estree_line(node, end: bool = False) -> Optional[int]:
+    loc = getattr(node, 'loc', None)
+    if loc is None:
+        return None
+    return loc.end.line if end else loc.start.line
+
+
+class _JavaScriptFactsCollector(_FactsCollector):
+    """Collects ES module imports, require() calls, calls, class extends and JSDoc from an esprima tree."""
+
+    def __init__(self, module_name: str, jsdoc_by_end_line: Dict[int, str]):
+        super().__init__(module_name)
+        self.jsdoc_by_end_line = jsdoc_by_end_line
+
+    def _jsdoc_for(self, node) -> Optional[str]:
+        line = _estree_line(node)
+        if line is None:
+            return None
+        return self.jsdoc_by_end_line.get(line - 1) or self.jsdoc_by_end_line.get(line)
+
+    def visit(self, node) -> None:
+        node_type = node.type
+        if node_type == 'ImportDeclaration':
+            source = node.source.value
+            names = [spec.local.name for spec in node.specifiers]
+            self.add_import(f"import {source}", source, names, _estree_line(node))
+            return
+        if node_type == 'CallExpression':
+            callee = node.callee
+            args = node.arguments
+            if (callee.type == 'Identifier' and callee.name == 'require' and args
+                    and args[0].type == 'Literal' and isinstance(args[0].value, str)):
+                self.add_import(f"require {args[0].value}", args[0].value, [], _estree_line(node))
+            elif callee.type == 'Identifier':
+                self.add_call(callee.name, _estree_line(node))
+            elif callee.type == 'MemberExpression' and callee.property.type == 'Identifier':
+                self.add_call(callee.property.name, _estree_line(node))
+        elif node_type in ('ClassDeclaration', 'ClassExpression') and node.id is not None:
+            base = _estree_name(node.superClass)
+            self._visit_definition(node, 'class', node.id.name, [base] if base else [])
+            return
+        elif node_type == 'FunctionDeclaration' and node.id is not None:
+            self._visit_definition(node, 'function', node.id.name)
+            return
+        elif node_type == 'MethodDefinition' and node.key.type == 'Identifier':
+            self._visit_definition(node, 'function', node.key.name)
+            return
+        elif (node_type == 'VariableDeclarator' and node.id.type == 'Identifier' and node.init is not None
+                and node.init.type in ('FunctionExpression', 'ArrowFunctionExpression')):
+            self._visit_definition(node, 'function', node.id.name)
+            return
+        self.generic_visit(node)
+
+    def generic_visit(self, node) -> None:
+        for key, value in vars(node).items():
+            if key in _ESTREE_SKIP_KEYS or value is None:
+                continue
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, esprima.nodes.Node):
+                        self.visit(item)
+            elif isinstance(value, esprima.nodes.Node):
+                self.visit(value)
+
+    def _visit_definition(self, node, kind: str, name: str, bases: List[str] = None) -> None:
+        self.add_definition(kind, name, _estree_line(node), _estree_line(node, end=True), bases=bases,
+                            docstring=self._jsdoc_for(node))
+        self.scope.append(name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+
+def _java_type_name(reference) -> Optional[str]:
+    if reference is None:
+        return None
+    name = reference.name
+    sub_type = getattr(reference, 'sub_type', None)
+    while sub_type is not None:
+        name = f"{name}.{sub_type.name}"
+        sub_type = getattr(sub_type, 'sub_type', None)
+    return name
+
+
+def _java_line(node) -> Optional[int]:
+    position = getattr(node, 'position', None)
+    return position.line if position else None
+
+
+class _JavaFactsCollector(_FactsCollector):
+    """Collects imports, method invocations, extends/implements and Javadoc from a javalang compilation unit."""
+
+    def visit(self, node) -> None:
+        if isinstance(node, javalang.tree.CompilationUnit):
+            for imp in node.imports or []:
+                path = f"{imp.path}.*" if imp.wildcard else imp.path
+                statement = f"import static {path}" if imp.static else f"import {path}"
+                self.add_import(statement, imp.path, [], _java_line(imp))
+            for type_declaration in node.types or []:
+                self.visit(type_declaration)
+            return
+        if isinstance(node, javalang.tree.MethodInvocation):
+            self.add_call(node.member, _java_line(node))
+        elif isinstance(node, javalang.tree.ClassDeclaration):
+            base = _java_type_name(node.extends)
+            interfaces = [_java_type_name(ref) for ref in node.implements or []]
+            self._visit_definition(node, 'class', [base] if base else [], interfaces)
+            return
+        elif isinstance(node, javalang.tree.InterfaceDeclaration):
+            bases = [_java_type_name(ref) for ref in node.extends or []]
+            self._visit_definition(node, 'class', bases)
+            return
+        elif isinstance(node, javalang.tree.EnumDeclaration):
+            interfaces = [_java_type_name(ref) for ref in node.implements or []]
+            self._visit_definition(node, 'class', interfaces=interfaces)
+            return
+        elif isinstance(node, (javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration)):
+            self._visit_definition(node, 'function')
+            return
+        self.generic_visit(node)
+
+    def generic_visit(self, node) -> None:
+        stack = [node.children]
+        while stack:
+            for child in stack.pop():
+                if isinstance(child, javalang.ast.Node):
+                    self.visit(child)
+                elif isinstance(child, (list, tuple)):
+                    stack.append(child)
+
+    def _visit_definition(self, node, kind: str, bases: List[str] = None, interfaces: List[str] = None) -> None:
+        docstring = DocumentationExtractor.clean_doc_comment(node.documentation) if node.documentation else None
+        self.add_definition(kind, node.name, _java_line(node), bases=bases, interfaces=interfaces,
+                            docstring=docstring)
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
 
 class DependencyAnalyzer:
-    
+
+    def extract_facts(self, ast_tree, module_name: str = '') -> Dict:
+        """
+        Extracts imports, calls, inheritance, definitions and doc comments in a single traversal.
+
+        Accepts a Python AST, an esprima ESTree program or a javalang compilation unit and
+        returns the same record shape for each. Definitions and calls carry qualified names
+        (module.Class.method) and line numbers.
+        """
+        if isinstance(ast_tree, ast.AST):
+            collector = _PythonFactsCollector(module_name)
+        elif isinstance(ast_tree, javalang.tree.CompilationUnit):
+            # Java definitions are qualified by package rather than by file path.
+            package = ast_tree.package.name if ast_tree.package else module_name
+            collector = _JavaFactsCollector(package)
+        else:
+            collector = _JavaScriptFactsCollector(module_name, DocumentationExtractor.jsdoc_by_end_line(ast_tree))
+        collector.visit(ast_tree)
+        result = collector.result()
+        result['module'] = module_name
+        return result
+
     def analyze_imports(self, ast_tree: AST) -> List[str]:
         """Extracts import statements from Python AST."""
         imports = []
@@ -36,5 +346,3 @@ class DependencyAnalyzer:
                     if isinstance(base, ast.Name):
                         inheritances.append(base.id)
         return inheritances
-    
-    # Similar methods can be implemented for JavaScript and Java ASTs
\ No newline at end of file
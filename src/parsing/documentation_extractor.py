@@ -1,15 +1,40 @@
-from typing import List
+import re
+from typing import Dict, List
+import ast
 from ast import AST
 import esprima
 import javalang
 
+_DOC_COMMENT_DELIMITERS = re.compile(r'^\s*(/\*\*|\*/|\*)?\s?')
+
+
 class DocumentationExtractor:
+
+    @staticmethod
+    def clean_doc_comment(text: str) -> str:
+        """Strips /** */ delimiters and leading asterisks from a JSDoc or Javadoc comment."""
+        text = text.strip()
+        if text.startswith('/**'):
+            text = text[3:]
+        if text.endswith('*/'):
+            text = text[:-2]
+        lines = [_DOC_COMMENT_DELIMITERS.sub('', line, count=1).rstrip() for line in text.splitlines()]
+        return '\n'.join(lines).strip()
+
+    @staticmethod
+    def jsdoc_by_end_line(program) -> Dict[int, str]:
+        """Maps the last line of each JSDoc block in an esprima program to its cleaned text."""
+        docs = {}
+        for comment in getattr(program, 'comments', None) or []:
+            if comment.type == 'Block' and comment.value.startswith('*') and comment.loc is not None:
+                docs[comment.loc.end.line] = DocumentationExtractor.clean_doc_comment('/*' + comment.value)
+        return docs
     
     def extract_docstrings(self, ast_tree: AST) -> List[str]:
         """Extracts docstrings from Python AST."""
         docstrings = []
         if isinstance(ast_tree, ast.Module):
-            docstrings.append(ast_tree.doc)
+            docstrings.append(ast.get_docstring(ast_tree))
         for node in ast.walk(ast_tree):
             if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
                 docstrings.append(ast.get_docstring(node))
@@ -23,4 +48,4 @@ class DocumentationExtractor:
                 comments.append(comment.value)
         return comments
     
-    # Methods for Java comments extraction can be added similarly
\ No newline at end of file
+    # javalang keeps only Javadoc (as declaration documentation), not free-standing comments
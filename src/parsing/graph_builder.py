@@ -0,0 +1,148 @@
+import hashlib
+from typing import Dict, List, Optional
+
+from .tokenizer import Tokenizer
+
+_tokenizer = None
+
+
+def node_id(label: str, name: str) -> str:
+    return f"{label.lower()}:{name}"
+
+
+def edge_id(source_id: str, edge_type: str, target_id: str) -> str:
+    key = f"{source_id}|{edge_type}|{target_id}".encode('utf-8')
+    return hashlib.sha1(key).hexdigest()
+
+
+def render_entity(label: str, properties: dict) -> Optional[str]:
+    """The text an entity contributes to a prompt's graph context, or None when it has no name."""
+    label = label or 'Entity'
+    name = properties.get('qualified_name') or properties.get('module') or properties.get('name') \
+        or properties.get('path')
+    if not name:
+        return None
+    location = properties.get('file') or properties.get('path')
+    if location and properties.get('lineno'):
+        location = f"{location}:{properties['lineno']}"
+    header = f"# {label} {name}" + (f" ({location})" if location else "")
+    docstring = properties.get('docstring')
+    return f"{header}\n{docstring.strip()}" if docstring else header
+
+
+def _add_token_counts(graph: 'FileGraph') -> None:
+    """
+    Stores the token count of each owned node's rendered text, so context assembly does
+    not tokenise it per prompt. Referenced nodes are left alone: their properties here
+    are partial and would overwrite the count written by the file that defines them.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = Tokenizer()
+    for nid in graph.owned:
+        node = graph.nodes[nid]
+        text = render_entity(node['label'], node['properties'])
+        if text is not None:
+            node['properties']['token_count'] = _tokenizer.count(text)
+
+
+def _import_name(statement: str) -> str:
+    if statement.startswith('from '):
+        return statement[len('from '):].split(' import', 1)[0].strip()
+    return statement[len('import '):].strip()
+
+
+class FileGraph:
+    """The nodes and edges contributed by one parsed file, in EdgeManager's bulk-write row format."""
+
+    def __init__(self, file_path: str, language: str):
+        self.file_id = node_id('File', file_path)
+        self.nodes: Dict[str, dict] = {}
+        self.edges: Dict[str, dict] = {}
+        # Nodes defined by this file; referenced nodes (imported modules, callees) are shared.
+        self.owned: List[str] = []
+        self.add_node(self.file_id, 'File', {'path': file_path, 'language': language}, owned=True)
+
+    def add_node(self, nid: str, label: str, properties: dict = None, owned: bool = False) -> str:
+        if nid not in self.nodes:
+            self.nodes[nid] = {'id': nid, 'label': label, 'properties': dict(properties or {})}
+            if owned:
+                self.owned.append(nid)
+        elif properties:
+            self.nodes[nid]['properties'].update(properties)
+        return nid
+
+    def add_edge(self, source_id: str, edge_type: str, target_id: str, attributes: dict = None) -> str:
+        eid = edge_id(source_id, edge_type, target_id)
+        if eid not in self.edges:
+            self.edges[eid] = {
+                'source_id': source_id,
+                'target_id': target_id,
+                'edge_type': edge_type,
+                'attributes': dict(attributes or {}, id=eid),
+            }
+        return eid
+
+
+def build_file_graph(file_path: str, language: str, result: dict) -> FileGraph:
+    """Maps the per-file facts produced by CodeParser onto graph nodes and edges."""
+    graph = FileGraph(file_path, language)
+    if 'definitions' in result:
+        _add_structured_facts(graph, file_path, result)
+        _add_token_counts(graph)
+        return graph
+    for statement in result.get('imports', []):
+        name = _import_name(statement)
+        if name and name != 'None':
+            target = graph.add_node(node_id('Module', name), 'Module', {'name': name})
+            graph.add_edge(graph.file_id, 'IMPORTS', target)
+    for name in result.get('function_calls', []):
+        target = graph.add_node(node_id('Function', name), 'Function', {'name': name})
+        graph.add_edge(graph.file_id, 'CALLS', target)
+    for name in result.get('inheritances', []):
+        target = graph.add_node(node_id('Class', name), 'Class', {'name': name})
+        graph.add_edge(graph.file_id, 'INHERITS', target)
+    _add_token_counts(graph)
+    return graph
+
+
+def _add_structured_facts(graph: FileGraph, file_path: str, result: dict) -> None:
+    """Builds definition nodes keyed by qualified name and links calls and bases to them where possible."""
+    graph.nodes[graph.file_id]['properties']['module'] = result.get('module', '')
+    by_qualified_name = {}
+    by_name = {}
+    for definition in result['definitions']:
+        label = 'Class' if definition['kind'] == 'class' else 'Function'
+        nid = graph.add_node(node_id(label, definition['qualified_name']), label, {
+            'name': definition['name'],
+            'qualified_name': definition['qualified_name'],
+            'file': file_path,
+            'lineno': definition['lineno'],
+            'end_lineno': definition.get('end_lineno'),
+            'docstring': definition.get('docstring'),
+        }, owned=True)
+        by_qualified_name[definition['qualified_name']] = nid
+        by_name.setdefault(definition['name'], nid)
+
+    for definition in result['definitions']:
+        nid = by_qualified_name[definition['qualified_name']]
+        parent = definition['qualified_name'].rpartition('.')[0]
+        graph.add_edge(by_qualified_name.get(parent, graph.file_id), 'CONTAINS', nid)
+        for base in definition.get('bases', []):
+            target = by_name.get(base) or graph.add_node(node_id('Class', base), 'Class', {'name': base})
+            graph.add_edge(nid, 'INHERITS', target)
+        for interface in definition.get('interfaces', []):
+            target = by_name.get(interface) or graph.add_node(node_id('Class', interface), 'Class', {'name': interface})
+            graph.add_edge(nid, 'IMPLEMENTS', target)
+
+    for detail in result.get('import_details', []):
+        name = detail['module']
+        if name:
+            target = graph.add_node(node_id('Module', name), 'Module', {'name': name})
+            graph.add_edge(graph.file_id, 'IMPORTS', target, {'lineno': detail['lineno']})
+
+    for call in result.get('calls', []):
+        source = by_qualified_name.get(call['caller'], graph.file_id)
+        name = call['name']
+        target = by_name.get(name) or graph.add_node(node_id('Function', name), 'Function', {'name': name})
+        graph.add_edge(source, 'CALLS', target, {'lineno': call['lineno']})
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Dict
+
+from .graph_builder import build_file_graph
+from .parser_interface import module_name_for
+
+MANIFEST_VERSION = 4
+
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _attributes_hash(attributes: dict) -> str:
+    return hashlib.sha1(json.dumps(attributes, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class FileManifest:
+    """
+    Persists path -> (mtime, size, content hash) together with the node and edge ids
+    each file contributed, so removals can be computed without re-parsing anything.
+    Edges also record a hash of their attributes, so edges whose id is unchanged but
+    whose attributes (e.g. a call's line number) moved are rewritten.
+    """
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self.entries: Dict[str, dict] = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as file:
+                data = json.load(file)
+            if data.get('version') == MANIFEST_VERSION:
+                self.entries = data.get('files', {})
+
+    def save(self) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, file, separators=(',', ':'))
+        os.replace(tmp_path, self.manifest_path)
+
+
+def manifest_entry(language: str, stat: os.stat_result, content_hash: str, graph) -> dict:
+    """The manifest record of a parsed file: how to detect changes and what it contributed to the graph."""
+    return {
+        'language': language,
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': content_hash,
+        'nodes': graph.owned,
+        'edges': [[eid, edge['edge_type'], _attributes_hash(edge['attributes'])]
+                  for eid, edge in graph.edges.items()],
+    }
+
+
+def empty_graph_diff() -> dict:
+    return {'upsert_nodes': [], 'remove_nodes': [], 'add_edges': [], 'remove_edges': []}
+
+
+class IncrementalParser:
+    """
+    Re-parses only files that were added, changed or deleted since the manifest was written.
+
+    The updated manifest is only saved once apply_diff has written the diff to the graph,
+    so a failed write leaves the changed files to be picked up again by the next run.
+    """
+
+    def __init__(self, code_parser, manifest_path: str):
+        self.code_parser = code_parser
+        self.manifest = FileManifest(manifest_path)
+        self.logger = logging.getLogger(__name__)
+
+    def parse_directory(self, directory_path: str, language: str, apply_diff: Callable[[dict], None]) -> dict:
+        parser = self.code_parser.parsers.get(language)
+        if not parser:
+            raise ValueError(f"Unsupported language: {language}")
+        diff = empty_graph_diff()
+        seen = set()
+        for file_path in parser.iter_files(directory_path):
+            rel_path = os.path.relpath(file_path, directory_path)
+            seen.add(rel_path)
+            stat = os.stat(file_path)
+            entry = self.manifest.entries.get(rel_path)
+            if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                continue
+            content_hash = hash_file(file_path)
+            if entry and entry['hash'] == content_hash:
+                entry['mtime'] = stat.st_mtime_ns
+                continue
+            self._reindex_file(file_path, directory_path, rel_path, language, stat, content_hash, entry, diff)
+
+        # Only files of this language are owned by this pass; others keep their entries.
+        for rel_path in list(self.manifest.entries):
+            entry = self.manifest.entries[rel_path]
+            if entry['language'] == language and rel_path not in seen:
+                diff['remove_nodes'].extend(entry['nodes'])
+                diff['remove_edges'].extend({'id': eid, 'edge_type': etype} for eid, etype, _ in entry['edges'])
+                del self.manifest.entries[rel_path]
+
+        apply_diff(diff)
+        self.manifest.save()
+        self.logger.info(
+            f"Incremental parse of {directory_path}: {len(diff['upsert_nodes'])} nodes to upsert, "
+            f"{len(diff['remove_nodes'])} to remove, {len(diff['add_edges'])} edges to add, "
+            f"{len(diff['remove_edges'])} to remove"
+        )
+        return diff
+
+    def _reindex_file(self, file_path, directory_path, rel_path, language, stat, content_hash, entry, diff) -> None:
+        try:
+            result = self.code_parser.parse_file(file_path, language, module_name_for(file_path, directory_path))
+        except Exception as e:
+            self.logger.warning(f"Failed to parse {file_path}: {e}")
+            result = {}
+        graph = build_file_graph(rel_path, language, result)
+
+        old_nodes = set(entry['nodes']) if entry else set()
+        old_edges = {eid: (etype, attributes) for eid, etype, attributes in entry['edges']} if entry else {}
+        diff['upsert_nodes'].extend(graph.nodes.values())
+        diff['remove_nodes'].extend(nid for nid in old_nodes if nid not in graph.nodes)
+        # New and changed edges alike: create_edges merges on the edge id and replaces its attributes.
+        diff['add_edges'].extend(
+            edge for eid, edge in graph.edges.items()
+            if eid not in old_edges or old_edges[eid][1] != _attributes_hash(edge['attributes'])
+        )
+        diff['remove_edges'].extend(
+            {'id': eid, 'edge_type': etype} for eid, (etype, _) in old_edges.items() if eid not in graph.edges
+        )
+        self.manifest.entries[rel_path] = manifest_entry(language, stat, content_hash, graph)
@@ -1,20 +1,18 @@
-import os
 from typing import List
 from .parser_interface import ParserInterface
 import javalang
 
 class JavaParser(ParserInterface):
-    
+
+    file_extension = '.java'
+
     def parse_file(self, file_path: str):
         with open(file_path, 'r') as file:
             content = file.read()
+        return self.parse_source(content, file_path)
+
+    def parse_source(self, content: str, file_path: str = '<unknown>'):
         return javalang.parse.parse(content)
     
     def parse_directory(self, directory_path: str) -> List:
-        asts = []
-        for root, _, files in os.walk(directory_path):
-            for file in files:
-                if file.endswith('.java'):
-                    file_path = os.path.join(root, file)
-                    asts.append(self.parse_file(file_path))
-        return asts
\ No newline at end of file
+        return [self.parse_file(file_path) for file_path in self.iter_files(directory_path)]
\ No newline at end of file
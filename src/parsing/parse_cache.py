@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from typing import Optional
+
+DEFAULT_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Access times only order eviction, so hits are recorded in batches rather than one write each.
+ACCESS_FLUSH_SIZE = int(os.getenv("PARSE_CACHE_ACCESS_FLUSH_SIZE", "256"))
+ACCESS_FLUSH_INTERVAL = float(os.getenv("PARSE_CACHE_ACCESS_FLUSH_INTERVAL", "10"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS facts_last_access ON facts (last_access);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('total_size', 0);
+"""
+
+
+def cache_key(content_hash: str, language: str, module_name: str, extractor_version: int) -> str:
+    # Qualified names embed the module name, so it is part of the key alongside the content.
+    return f"{content_hash}:{language}:{module_name}:{extractor_version}"
+
+
+def hash_content(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class ParseCache:
+    """
+    On-disk cache of extracted facts, stored as compressed JSON in SQLite.
+
+    The cache file may be shared between projects, so it holds plain data only and
+    never anything that is executed on load. SQLite in WAL mode lets several worker
+    processes read and write the same file concurrently. Hits are pure reads; their
+    access times are written in batches, so eviction is approximately least recently
+    used, once the stored size exceeds max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._conn = None
+        self._pid = None
+        # key -> last access time not yet written to the database
+        self._accessed = {}
+        self._flushed_at = time.monotonic()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not cross a fork, so each process opens its own.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+            self._accessed = {}
+        return self._conn
+
+    def get(self, key: str) -> Optional[dict]:
+        conn = self._connection()
+        row = conn.execute("SELECT data FROM facts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            facts = json.loads(zlib.decompress(row[0]))
+        except (zlib.error, ValueError):
+            # Unreadable or written by an older format; it is replaced on the next put().
+            return None
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= ACCESS_FLUSH_SIZE or \
+                time.monotonic() - self._flushed_at >= ACCESS_FLUSH_INTERVAL:
+            self.flush_access_times()
+        return facts
+
+    def flush_access_times(self) -> None:
+        """Writes the access times of recent hits in one transaction."""
+        if not self._accessed:
+            return
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_access_times(conn)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.logger.warning(f"Failed to record parse cache access times: {e}")
+
+    def _write_access_times(self, conn: sqlite3.Connection) -> None:
+        conn.executemany("UPDATE facts SET last_access = ? WHERE key = ?",
+                         [(accessed, key) for key, accessed in self._accessed.items()])
+        self._accessed = {}
+        self._flushed_at = time.monotonic()
+
+    def put(self, key: str, facts: dict) -> None:
+        data = zlib.compress(json.dumps(facts, separators=(',', ':')).encode())
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Already holding the write lock, so pending access times ride along.
+            if self._accessed:
+                self._write_access_times(conn)
+            row = conn.execute("SELECT size FROM facts WHERE key = ?", (key,)).fetchone()
+            delta = len(data) - (row[0] if row else 0)
+            conn.execute(
+                "INSERT OR REPLACE INTO facts (key, data, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time())
+            )
+            conn.execute("UPDATE meta SET value = value + ? WHERE name = 'total_size'", (delta,))
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.logger.warning(f"Failed to write parse cache entry {key}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+        while total > self.max_bytes:
+            victims = conn.execute("SELECT key, size FROM facts ORDER BY last_access LIMIT 256").fetchall()
+            if not victims:
+                break
+            evicted = []
+            for key, size in victims:
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM facts WHERE key = ?", evicted)
+        conn.execute("UPDATE meta SET value = ? WHERE name = 'total_size'", (total,))
+
+    def close(self) -> None:
+        if self._conn is not None and self._pid == os.getpid():
+            self.flush_access_times()
+            self._conn.close()
+        self._conn = None
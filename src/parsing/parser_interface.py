@@ -1,15 +1,38 @@
+import os
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterator, List
 from ast import AST
 
+
+def module_name_for(file_path: str, root: str = None) -> str:
+    """Derives a dotted module name from a file path, relative to root when given."""
+    path = os.path.relpath(file_path, root) if root else os.path.basename(file_path)
+    return os.path.splitext(path)[0].replace(os.sep, '.')
+
+
 class ParserInterface(ABC):
-    
+
+    file_extension = ''
+
     @abstractmethod
     def parse_file(self, file_path: str) -> AST:
         """Parses a single file and returns its Abstract Syntax Tree (AST)."""
         pass
     
+    @abstractmethod
+    def parse_source(self, content: str, file_path: str = '<unknown>') -> AST:
+        """Parses source text that has already been read from file_path."""
+        pass
+
     @abstractmethod
     def parse_directory(self, directory_path: str) -> List[AST]:
         """Recursively parses all files within a directory and returns their ASTs."""
-        pass
\ No newline at end of file
+        pass
+
+    def iter_files(self, directory_path: str) -> Iterator[str]:
+        """Yields the paths of all files this parser handles, in a stable order."""
+        for root, dirs, files in os.walk(directory_path):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith(self.file_extension):
+                    yield os.path.join(root, file)
@@ -0,0 +1,42 @@
+import os
+import re
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a word/punctuation approximation.
+    tiktoken = None
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class Tokenizer:
+    """Counts and slices text by model tokens, using tiktoken when it is installed."""
+
+    def __init__(self, encoding: str = None):
+        self._encoding = None
+        if tiktoken is not None:
+            self._encoding = tiktoken.get_encoding(encoding or os.getenv("TOKENIZER_ENCODING", "cl100k_base"))
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return sum(1 for _ in _TOKEN_PATTERN.finditer(text))
+
+    def split(self, text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+        """Splits text into pieces of at most max_tokens tokens, each sharing overlap tokens with the previous one."""
+        step = max(1, max_tokens - overlap)
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            return [self._encoding.decode(tokens[start:start + max_tokens])
+                    for start in range(0, max(len(tokens) - overlap, 1), step)]
+        # Slice the original text at token boundaries so whitespace and layout survive.
+        starts = [match.start() for match in _TOKEN_PATTERN.finditer(text)]
+        if not starts:
+            return [text]
+        pieces = []
+        for first in range(0, max(len(starts) - overlap, 1), step):
+            last = first + max_tokens
+            end = starts[last] if last < len(starts) else len(text)
+            pieces.append(text[starts[first]:end])
+        return pieces